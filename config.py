@@ -14,6 +14,89 @@ OPENAI_KEY = os.getenv("OPENAI_KEY")
 BASE_URL = os.getenv("BASE_URL")
 STATE = os.getenv("STATE")
 COUNTY = os.getenv("COUNTY")
+# Optional JSON file listing several scraping targets; BASE_URL/STATE/COUNTY are used when unset
+TARGETS_FILE = os.getenv("TARGETS_FILE")
+SCRAPE_INTERVAL_SECONDS = int(os.getenv("SCRAPE_INTERVAL_SECONDS", "300"))  # during peak hours
+SCRAPE_OFF_PEAK_INTERVAL_SECONDS = int(os.getenv("SCRAPE_OFF_PEAK_INTERVAL_SECONDS", "1800"))
+SCRAPE_PEAK_HOURS = os.getenv("SCRAPE_PEAK_HOURS", "8-22")  # START-END on a 24h clock, may wrap past midnight
+SCRAPE_TIMEZONE = os.getenv("SCRAPE_TIMEZONE")  # e.g. America/Chicago; targets can override, defaults to local time
+MAX_PARALLEL_TARGETS = int(os.getenv("MAX_PARALLEL_TARGETS", "4"))
+
+# "concurrent" fetches articles and images in a worker pool, "serial" keeps the old sleep-after-request behaviour
+SCRAPER_MODE = os.getenv("SCRAPER_MODE", "concurrent")
+SCRAPER_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", "4"))
+SCRAPER_RATE_LIMIT = float(os.getenv("SCRAPER_RATE_LIMIT", "1.0"))  # requests per second per host
+SCRAPER_BURST = int(os.getenv("SCRAPER_BURST", "4"))
+# The per-host rate starts at SCRAPER_RATE_LIMIT, rises towards this while the site responds normally and halves on 429/5xx
+SCRAPER_MAX_RATE_LIMIT = float(os.getenv("SCRAPER_MAX_RATE_LIMIT", "2.0"))
+DEDUP_WINDOW_DAYS = int(os.getenv("DEDUP_WINDOW_DAYS", "7"))
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "50"))
+DB_BATCH_FLUSH_SECONDS = int(os.getenv("DB_BATCH_FLUSH_SECONDS", "30"))
+HTTP_CACHE_FILE = os.getenv("HTTP_CACHE_FILE", "http_cache.json")
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "3600"))
+CRAWL_STATE_FILE = os.getenv("CRAWL_STATE_FILE", "crawl_state.json")
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "2"))  # months scraped in parallel by python -m scraper.backfill
+BACKFILL_CHECKPOINT_FILE = os.getenv("BACKFILL_CHECKPOINT_FILE", "backfill_checkpoint.json")
+
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()  # JPEG, WEBP or AVIF
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "90"))
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "0"))  # 0 keeps the source size
+IMAGE_INDEX_FILE = os.getenv("IMAGE_INDEX_FILE", "image_index.db")
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))  # bits out of 64
+# Where cropped images go: "supabase", "s3" (any S3-compatible store, e.g. MinIO) or "local"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # unset for AWS, e.g. http://localhost:9000 for MinIO
+S3_REGION = os.getenv("S3_REGION")
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL")  # CDN or bucket URL that image links are built from
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "images")
+LOCAL_STORAGE_BASE_URL = os.getenv("LOCAL_STORAGE_BASE_URL")
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+UPLOAD_MAX_PENDING = int(os.getenv("UPLOAD_MAX_PENDING", "16"))
+UPLOAD_MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", "4"))
+
+POSTER_WORKERS = int(os.getenv("POSTER_WORKERS", "1"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+# "pipelined" generates captions ahead of time while posting at POST_INTERVAL_SECONDS, "sequential" does one at a time
+POSTER_MODE = os.getenv("POSTER_MODE", "pipelined")
+POST_INTERVAL_SECONDS = float(os.getenv("POST_INTERVAL_SECONDS", "18"))
+POST_MAX_INTERVAL_SECONDS = float(os.getenv("POST_MAX_INTERVAL_SECONDS", "600"))  # ceiling while Facebook throttles
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "3"))
+READY_BUFFER_SIZE = int(os.getenv("READY_BUFFER_SIZE", "5"))
+CAPTION_CACHE_FILE = os.getenv("CAPTION_CACHE_FILE", "caption_cache.db")
+CAPTION_CACHE_TTL = int(os.getenv("CAPTION_CACHE_TTL", str(7 * 24 * 3600)))
+CAPTION_CACHE_MAX_ENTRIES = int(os.getenv("CAPTION_CACHE_MAX_ENTRIES", "5000"))
+# "fallback" uses OpenAI and the local template when it fails, "llm" only OpenAI, "template" only the local template
+CAPTION_MODE = os.getenv("CAPTION_MODE", "fallback")
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # point at a local fake API for testing
+BATCH_BACKLOG_THRESHOLD = int(os.getenv("BATCH_BACKLOG_THRESHOLD", "20"))
+BATCH_MAX_RECORDS = int(os.getenv("BATCH_MAX_RECORDS", "500"))
+BATCH_LEASE_SECONDS = int(os.getenv("BATCH_LEASE_SECONDS", "3600"))
+
+# Log viewer: lines kept for replay to new viewers, lines buffered between processes, concurrent viewers
+LOG_STREAM_HISTORY = int(os.getenv("LOG_STREAM_HISTORY", "1000"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+WEB_WORKER_CONNECTIONS = int(os.getenv("WEB_WORKER_CONNECTIONS", "1000"))
+
+# Each process writes its metrics here every METRICS_EXPORT_SECONDS; /metrics merges them
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+METRICS_EXPORT_SECONDS = float(os.getenv("METRICS_EXPORT_SECONDS", "5"))
+
+# Shared HTTP clients (scraper pages, scraper images, Facebook); HTTP/2 is used when the h2 package is installed
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() in ("1", "true", "yes")
+FACEBOOK_TIMEOUT = float(os.getenv("FACEBOOK_TIMEOUT", "60"))
+
+# Analytics export (python -m scraper.export); Parquet when pyarrow is installed, gzipped JSON lines otherwise
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+EXPORT_SETTLE_SECONDS = int(os.getenv("EXPORT_SETTLE_SECONDS", "300"))
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
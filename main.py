@@ -4,12 +4,26 @@ import multiprocessing
 import time
 import signal
 import os
-from scraper.database import DatabaseManager
-from config import FACEBOOK_ACCESS_TOKEN, FACEBOOK_PAGE_ID, OPENAI_KEY
-import gunicorn.app.base
+import sys
+from config import FACEBOOK_ACCESS_TOKEN, FACEBOOK_PAGE_ID, OPENAI_KEY, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, POSTER_WORKERS
+from config import POSTER_MODE, POST_INTERVAL_SECONDS, POST_MAX_INTERVAL_SECONDS, GENERATION_WORKERS, READY_BUFFER_SIZE
+from config import CAPTION_CACHE_FILE, CAPTION_CACHE_TTL, CAPTION_CACHE_MAX_ENTRIES, CAPTION_MODE, OPENAI_TIMEOUT
+from config import OPENAI_BASE_URL, BATCH_BACKLOG_THRESHOLD, BATCH_MAX_RECORDS, BATCH_LEASE_SECONDS
+from config import LOG_QUEUE_SIZE, LOG_STREAM_HISTORY, WEB_WORKER_CONNECTIONS, METRICS_DIR, METRICS_EXPORT_SECONDS
 from datetime import date
-from flask import Flask, render_template_string, Response
-import queue
+from utils.log_stream import LogQueueHandler
+from utils.metrics import REGISTRY
+
+# With the spawn start method every child re-imports this module, so the top
+# level only sets up logging. Each role imports its own dependencies, listed
+# here so --profile-startup measures exactly what a child process loads.
+ROLE_MODULES = {
+    "main": ["main", "scraper.database"],
+    "scraper": ["main", "scraper.scraping_engine"],
+    "poster": ["main", "utils.facebook_poster", "utils.openai_generator", "utils.caption_renderer",
+               "scraper.job_queue", "utils.caption_cache", "utils.posting_pipeline"],
+    "web": ["main", "flask", "gunicorn.app.base"],
+}
 
 # Set up logging
 log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
@@ -19,152 +33,210 @@ file_handler.setFormatter(log_formatter)
 stream_handler = logging.StreamHandler()
 stream_handler.setFormatter(log_formatter)
 
-# Create a queue for storing log messages
-log_queue = multiprocessing.Queue()
-
-# Custom handler to capture logs for web display
-class QueueHandler(logging.Handler):
-    def emit(self, record):
-        log_entry = self.format(record)
-        log_queue.put(log_entry)
-
-queue_handler = QueueHandler()
-queue_handler.setFormatter(log_formatter)
-
 # Create a logger
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 logger.addHandler(file_handler)
 logger.addHandler(stream_handler)
-logger.addHandler(queue_handler)
-
-# Flask app
-app = Flask(__name__)
-
-@app.route('/')
-def home():
-    html_template = '''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Mugshot Scraper Logs</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 0; padding: 20px; }
-            #log-container { height: 80vh; overflow-y: scroll; border: 1px solid #ccc; padding: 10px; }
-            .log { margin-bottom: 10px; }
-        </style>
-        <script>
-            var eventSource = new EventSource("/stream");
-            eventSource.onmessage = function(e) {
-                var logContainer = document.getElementById('log-container');
-                logContainer.innerHTML += '<div class="log">' + e.data + '</div>';
-                logContainer.scrollTop = logContainer.scrollHeight;
-            };
-        </script>
-    </head>
-    <body>
-        <h1>Mugshot Scraper Logs</h1>
-        <div id="log-container"></div>
-    </body>
-    </html>
-    '''
-    return render_template_string(html_template)
-
-@app.route('/stream')
-def stream():
-    def event_stream():
-        while True:
-            try:
-                message = log_queue.get(timeout=1)
-                yield f"data: {message}\n\n"
-            except queue.Empty:
-                yield f"data: Checking\n\n"
-            time.sleep(0.1)
-    return Response(event_stream(), content_type='text/event-stream')
-
-class StandaloneApplication(gunicorn.app.base.BaseApplication):
-    def __init__(self, app, options=None):
-        self.options = options or {}
-        self.application = app
-        super().__init__()
-
-    def load_config(self):
-        config = {key: value for key, value in self.options.items()
-                  if key in self.cfg.settings and value is not None}
-        for key, value in config.items():
-            self.cfg.set(key.lower(), value)
-
-    def load(self):
-        return self.application
-
-def run_web_server():
+
+def attach_log_queue(log_queue):
+    # The queue is created once in the parent and handed to each child, so every process feeds the same viewer
+    # Don't hold up process exit flushing lines that no viewer may be reading
+    log_queue.cancel_join_thread()
+    queue_handler = LogQueueHandler(log_queue)
+    queue_handler.setFormatter(log_formatter)
+    logger.addHandler(queue_handler)
+
+def create_app(log_queue):
+    from flask import Flask, render_template_string, Response, request
+    from utils.log_stream import LogBroadcaster, format_sse
+
+    app = Flask(__name__)
+    broadcaster = LogBroadcaster(LOG_STREAM_HISTORY)
+    broadcaster.start_pump(log_queue)
+
+
+    @app.route('/')
+    def home():
+        html_template = '''
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Mugshot Scraper Logs</title>
+            <style>
+                body { font-family: Arial, sans-serif; margin: 0; padding: 20px; }
+                #log-container { height: 80vh; overflow-y: scroll; border: 1px solid #ccc; padding: 10px; }
+                .log { margin-bottom: 10px; }
+            </style>
+            <script>
+                var eventSource = new EventSource("/stream");
+                eventSource.onmessage = function(e) {
+                    var logContainer = document.getElementById('log-container');
+                    var line = document.createElement('div');
+                    line.className = 'log';
+                    line.textContent = e.data;
+                    logContainer.appendChild(line);
+                    logContainer.scrollTop = logContainer.scrollHeight;
+                };
+            </script>
+        </head>
+        <body>
+            <h1>Mugshot Scraper Logs</h1>
+            <div id="log-container"></div>
+        </body>
+        </html>
+        '''
+        return render_template_string(html_template)
+
+    @app.route('/stream')
+    def stream():
+        # A new viewer replays the buffered history; a reconnecting one resumes after the last line it saw
+        last_event_id = request.headers.get('Last-Event-ID', '')
+        cursor = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+
+        def event_stream(cursor):
+            while True:
+                entries = broadcaster.read(cursor, timeout=15)
+                if not entries:
+                    yield ": keepalive\n\n"
+                    continue
+                cursor = entries[-1][0] + 1
+                yield format_sse(entries)
+                # Let lines accumulate briefly so bursts go out as one frame
+                time.sleep(0.25)
+        return Response(event_stream(cursor), content_type='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(REGISTRY.render(METRICS_DIR), content_type='text/plain; version=0.0.4')
+
+    return app
+
+def run_web_server(log_queue):
+    import gunicorn.app.base
+
+    class StandaloneApplication(gunicorn.app.base.BaseApplication):
+        def __init__(self, options=None):
+            self.options = options or {}
+            super().__init__()
+
+        def load_config(self):
+            config = {key: value for key, value in self.options.items()
+                      if key in self.cfg.settings and value is not None}
+            for key, value in config.items():
+                self.cfg.set(key.lower(), value)
+
+        def load(self):
+            # Built inside the worker, after gevent has patched threading and the socket layer
+            return create_app(log_queue)
+
     options = {
         'bind': '0.0.0.0:5000',
         'workers': 1,
+        'worker_class': 'gevent',
+        'worker_connections': WEB_WORKER_CONNECTIONS,
         'timeout': 120,
     }
-    StandaloneApplication(app, options).run()
+    StandaloneApplication(options).run()
 
-def scrape_data(exit_event):
-    from scraper.website_scraper import WebsiteScraper
-    scraper = WebsiteScraper(logger)
+def scrape_data(exit_event, log_queue):
+    attach_log_queue(log_queue)
+    REGISTRY.start_exporter(METRICS_DIR, "scraper", METRICS_EXPORT_SECONDS)
+    from scraper.scraping_engine import ScrapingEngine
+    engine = ScrapingEngine(logger)
     while not exit_event.is_set():
         try:
             logger.info("Starting scraping process")
-            scraper.scrape()
-            logger.info("Scraping process completed")
-            for _ in range(60):  # 5 minutes in 5-second increments
-                if exit_event.is_set():
-                    break
-                time.sleep(5)
+            engine.run(exit_event)
         except Exception as e:
             logger.error(f"Error during scraping: {str(e)}")
             logger.exception("Exception details:")
+            time.sleep(5)
     logger.info("Scraper process shutting down")
 
-def process_data_and_post_to_facebook(exit_event):
+def process_data_and_post_to_facebook(exit_event, log_queue):
+    attach_log_queue(log_queue)
+    REGISTRY.start_exporter(METRICS_DIR, "poster", METRICS_EXPORT_SECONDS)
     from utils.facebook_poster import FacebookPoster
     from utils.openai_generator import OpenAIGenerator
-    from utils.prompt import get_prompt
+    from utils.caption_renderer import CaptionComposer
+    from scraper.job_queue import JobQueue
+    from utils.caption_cache import CaptionCache
+    from scraper.rate_limiter import AdaptiveInterval
 
     fb_poster = FacebookPoster(FACEBOOK_ACCESS_TOKEN, FACEBOOK_PAGE_ID, logger)
-    ai_generator = OpenAIGenerator(OPENAI_KEY)
+    ai_generator = None
+    if CAPTION_MODE != "template":
+        caption_cache = CaptionCache(CAPTION_CACHE_FILE, CAPTION_CACHE_TTL, CAPTION_CACHE_MAX_ENTRIES)
+        ai_generator = OpenAIGenerator(OPENAI_KEY, caption_cache, OPENAI_TIMEOUT, OPENAI_BASE_URL)
+    composer = CaptionComposer(ai_generator, CAPTION_MODE)
+    job_queue = JobQueue(f"poster-{os.getpid()}", JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS)
+
+    if CAPTION_MODE != "template":
+        # The batch can take up to its lease; records it did not claim are posted in the meantime
+        from utils.posting_pipeline import start_backlog_captions
+        start_backlog_captions(job_queue, ai_generator, logger, BATCH_BACKLOG_THRESHOLD, BATCH_MAX_RECORDS,
+                               BATCH_LEASE_SECONDS)
 
+    if POSTER_MODE == "pipelined":
+        from utils.posting_pipeline import PostingPipeline
+        pipeline = PostingPipeline(job_queue, composer, fb_poster, logger, GENERATION_WORKERS,
+                                   READY_BUFFER_SIZE, POST_INTERVAL_SECONDS, POST_MAX_INTERVAL_SECONDS)
+        pipeline.run(exit_event)
+        logger.info("Facebook posting process shutting down")
+        return
+
+    post_pacer = AdaptiveInterval(POST_INTERVAL_SECONDS, POST_MAX_INTERVAL_SECONDS)
     while not exit_event.is_set():
         try:
-            today = date.today()
-            new_records = DatabaseManager.get_todays_unprocessed_mugshots(today)
-            
-            if not new_records:
+            job_queue.recover_expired_posts()
+            record = job_queue.claim(date.today())
+
+            if record is None:
                 logger.info("No new records found for today. Waiting for new data...")
-                time.sleep(60)
+                job_queue.wait_for_jobs(60)
                 continue
 
-            for record in new_records:
-                if exit_event.is_set():
-                    break
-                try:
-                    if record.dateOfBooking != today:
-                        logger.warning(f"Skipping record {record.id} as it's not from today.")
+            try:
+                generated_content = record.caption
+                if not generated_content:
+                    generated_content = composer.compose(record)
+                    if not generated_content:
+                        job_queue.fail(record.id, "Empty caption", record.attempts)
                         continue
-
-                    prompt = get_prompt(record)
-                    generated_content = ai_generator.generate_content(prompt)
+                    job_queue.save_caption(record.id, record.attempts, generated_content)
                     logger.info("Generated content successfully.")
 
-                    post_success = fb_poster.post_to_facebook(generated_content, record.imagePath)
+                if not job_queue.mark_posting(record.id, record.attempts):
+                    logger.warning(f"Lost the lease on record {record.id} before posting. Skipping.")
+                    continue
+                started_at = time.monotonic()
+                post_success = fb_poster.post_to_facebook(generated_content, record.imagePath)
+                if fb_poster.throttled:
+                    post_pacer.on_throttle(fb_poster.retry_after)
+                    logger.warning(f"Facebook is rate limiting posts. Posting every {post_pacer.interval:.0f}s")
+                elif post_success:
+                    post_pacer.on_success()
 
-                    if post_success:
-                        DatabaseManager.mark_as_processed(record.id)
-                        logger.info(f"Record {record.id} processed and posted successfully.")
+                if post_success:
+                    job_queue.complete(record.id, record.attempts)
+                    logger.info(f"Record {record.id} processed and posted successfully.")
+                else:
+                    logger.error(f"Failed to post record {record.id} to Facebook. Not marking as processed.")
+                    if fb_poster.outcome_unknown:
+                        job_queue.fail(record.id, "Facebook post timed out; it may already be live", record.attempts,
+                                       retry=False)
                     else:
-                        logger.error(f"Failed to post record {record.id} to Facebook. Not marking as processed.")
+                        job_queue.fail(record.id, "Facebook post failed", record.attempts)
 
-                    time.sleep(18)  # Respect Facebook's rate limit
+                # Respect Facebook's rate limit, widening the gap while it pushes back
+                exit_event.wait(max(0, post_pacer.next_start(started_at) - time.monotonic()))
 
-                except Exception as e:
-                    logger.error(f"Error processing record {record.id}: {str(e)}")
-                    logger.exception("Exception details:")
+            except Exception as e:
+                logger.error(f"Error processing record {record.id}: {str(e)}")
+                logger.exception("Exception details:")
+                job_queue.fail(record.id, e, record.attempts)
         except Exception as e:
             logger.error(f"Error in process_data_and_post_to_facebook: {str(e)}")
             logger.exception("Exception details:")
@@ -175,6 +247,11 @@ def signal_handler(signum, frame):
     exit_event.set()
 
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv:
+        from utils.startup_profile import report
+        report(ROLE_MODULES)
+        sys.exit(0)
+
     # Check if start method is already set
     if multiprocessing.get_start_method(allow_none=True) is None:
         try:
@@ -183,25 +260,37 @@ if __name__ == "__main__":
             logger.warning("Could not set start method to 'spawn'. Using default method.")
     
     exit_event = multiprocessing.Event()
+    log_queue = multiprocessing.Queue(LOG_QUEUE_SIZE)
+    attach_log_queue(log_queue)
     
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
     try:
+        from utils.metrics import clear_snapshots
+        clear_snapshots(METRICS_DIR)
+        REGISTRY.start_exporter(METRICS_DIR, "main", METRICS_EXPORT_SECONDS)
+
+        from scraper.database import DatabaseManager
         DatabaseManager.create_table_if_not_exists()
         logger.info("Initialized components successfully.")
         
-        scrape_process = multiprocessing.Process(target=scrape_data, args=(exit_event,))
-        post_process = multiprocessing.Process(target=process_data_and_post_to_facebook, args=(exit_event,))
-        web_process = multiprocessing.Process(target=run_web_server)
+        scrape_process = multiprocessing.Process(target=scrape_data, args=(exit_event, log_queue))
+        post_processes = [
+            multiprocessing.Process(target=process_data_and_post_to_facebook, args=(exit_event, log_queue))
+            for _ in range(POSTER_WORKERS)
+        ]
+        web_process = multiprocessing.Process(target=run_web_server, args=(log_queue,))
 
         scrape_process.start()
-        post_process.start()
+        for post_process in post_processes:
+            post_process.start()
         web_process.start()
 
         # Wait for processes to complete
         scrape_process.join()
-        post_process.join()
+        for post_process in post_processes:
+            post_process.join()
         web_process.join()
 
     except Exception as e:
@@ -209,7 +298,7 @@ if __name__ == "__main__":
         logger.exception("Exception details:")
     finally:
         exit_event.set()
-        for process in [scrape_process, post_process, web_process]:
+        for process in [scrape_process, *post_processes, web_process]:
             if process.is_alive():
                 process.terminate()
                 process.join(timeout=5)
@@ -0,0 +1,204 @@
+import argparse
+import calendar
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from datetime import date, datetime
+import httpx
+from scraper.scraping_target import ScrapingTarget, load_targets
+from scraper.website_scraper import WebsiteScraper
+from config import BASE_URL, STATE, COUNTY, TARGETS_FILE, BACKFILL_WORKERS, BACKFILL_CHECKPOINT_FILE
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_STATUS = "backfilled"
+
+
+class BackfillCheckpoint:
+    """Which archive pages of each month shard are already loaded, kept in a JSON file.
+
+    A page is only recorded once its records are in the database, so a
+    backfill that crashes resumes with the first page that was not finished.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.shards = json.load(f)
+        except FileNotFoundError:
+            self.shards = {}
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.shards, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _shard(self, key):
+        return self.shards.setdefault(key, {"pages": [], "done": False})
+
+    def is_done(self, key):
+        with self.lock:
+            return self.shards.get(key, {}).get("done", False)
+
+    def page_done(self, key, page):
+        with self.lock:
+            return page in self.shards.get(key, {}).get("pages", [])
+
+    def complete_page(self, key, page):
+        with self.lock:
+            self._shard(key)["pages"].append(page)
+            self._save()
+
+    def complete_shard(self, key):
+        with self.lock:
+            self._shard(key)["done"] = True
+            self._save()
+
+
+def month_range(start_date, end_date):
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+class Backfill:
+    """Loads a target's monthly archive for a date range without queueing anything for Facebook.
+
+    Each month is a shard. Shards run in parallel on `workers` threads; a
+    shard walks its listing pages in order, fetching the articles on each
+    page in parallel through the scraper's own pool. Records are written
+    through the batch writer with fb_status "backfilled", so the poster
+    never picks them up.
+    """
+
+    def __init__(self, logger, target, start_date, end_date, workers=BACKFILL_WORKERS,
+                 checkpoint_file=BACKFILL_CHECKPOINT_FILE):
+        self.logger = logger
+        self.target = target
+        self.start_date = start_date
+        self.end_date = end_date
+        self.workers = workers
+        self.checkpoint = BackfillCheckpoint(checkpoint_file)
+        self.scraper = WebsiteScraper(logger, target, fb_status=BACKFILL_STATUS)
+
+    def _shard_key(self, year, month):
+        return f"{self.target.state}/{self.target.county}/{year}-{month:02d}"
+
+    def _store_page(self):
+        # Everything queued for this page must be in the database before it is checkpointed
+        self.scraper.upload_pool.drain()
+        self.scraper.batch_writer.flush(raise_errors=True)
+
+    def _run_shard(self, year, month):
+        key = self._shard_key(year, month)
+        first_day = max(self.start_date, date(year, month, 1))
+        last_day = min(self.end_date, date(year, month, calendar.monthrange(year, month)[1]))
+        self.scraper.dedup_index.preload(first_day, last_day)
+        url = f"{self.scraper.base_url}/{year}/{month:02d}/"
+        page = 1
+        loaded = 0
+        failed_pages = []
+
+        while self.scraper.running:
+            if self.checkpoint.page_done(key, page):
+                page += 1
+                continue
+            page_url = url if page == 1 else f"{url}page/{page}/"
+            try:
+                response = self.scraper._make_request(page_url, url_class="listing")
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 404:
+                    break
+                raise
+            entries = self.scraper.listing_entries(response.content)
+            if not entries:
+                break
+
+            futures = []
+            failures = []
+            for link, firstName, lastName, booking_date in entries:
+                if first_day <= booking_date <= last_day:
+                    if self.scraper.submit_if_new(link, firstName, lastName, booking_date, futures,
+                                                  on_failed=lambda link=link: failures.append(link)):
+                        loaded += 1
+            wait(futures)
+            self._store_page()
+            if failures:
+                # Leave the page uncheckpointed so the next run retries the bookings that failed
+                failed_pages.append(page)
+                self.logger.warning(f"{len(failures)} bookings on {key} page {page} failed")
+            else:
+                self.checkpoint.complete_page(key, page)
+                self.logger.info(f"Backfilled {key} page {page}")
+
+            # Listings are newest first, so once a whole page is older than the range the shard is finished
+            if all(booking_date < first_day for _, _, _, booking_date in entries):
+                break
+            page += 1
+
+        if failed_pages:
+            raise RuntimeError(f"pages {', '.join(map(str, failed_pages))} had failed bookings")
+        if self.scraper.running:
+            self.checkpoint.complete_shard(key)
+            self.logger.info(f"Finished backfill shard {key}: {loaded} bookings queued")
+
+    def run(self):
+        shards = [(year, month) for year, month in month_range(self.start_date, self.end_date)
+                  if not self.checkpoint.is_done(self._shard_key(year, month))]
+        self.logger.info(f"Backfilling {self.target} from {self.start_date} to {self.end_date}: {len(shards)} months")
+        failed = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(self._run_shard, year, month): (year, month) for year, month in shards}
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        failed += 1
+                        year, month = futures[future]
+                        self.logger.error(f"Backfill shard {self._shard_key(year, month)} failed: {str(e)}")
+                        self.logger.exception("Exception details:")
+        finally:
+            self.scraper.upload_pool.drain()
+            self.scraper.batch_writer.flush()
+            self.scraper.stop()
+        if failed:
+            self.logger.warning(f"{failed} backfill shards failed; run the same command again to resume them")
+        return failed == 0
+
+    def stop(self):
+        self.scraper.running = False
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load historical bookings without posting them to Facebook.")
+    parser.add_argument("start", type=parse_date, help="first booking date, YYYY-MM-DD")
+    parser.add_argument("end", type=parse_date, help="last booking date, YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS, help="months scraped in parallel")
+    parser.add_argument("--checkpoint", default=BACKFILL_CHECKPOINT_FILE, help="checkpoint file")
+    parser.add_argument("--county", help="only backfill the target with this county")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from scraper.database import DatabaseManager
+    DatabaseManager.create_table_if_not_exists()
+
+    targets = load_targets(TARGETS_FILE, ScrapingTarget(STATE, COUNTY, BASE_URL))
+    if args.county:
+        targets = [target for target in targets if target.county == args.county]
+    ok = True
+    for target in targets:
+        ok = Backfill(logger, target, args.start, args.end, args.workers, args.checkpoint).run() and ok
+    raise SystemExit(0 if ok else 1)
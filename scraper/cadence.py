@@ -0,0 +1,49 @@
+import logging
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+logger = logging.getLogger(__name__)
+
+
+def parse_hours(value):
+    """Parse "START-END" (24h clock, END exclusive, may wrap past midnight) into a tuple of ints."""
+    start, end = value.split("-", 1)
+    return int(start) % 24, int(end) % 24
+
+
+class ScrapeCadence:
+    """Decides how long to wait before scraping a target again.
+
+    During peak hours (in the target's timezone) the target is scraped every
+    peak_interval seconds, outside them every off_peak_interval. Each cycle
+    in a row that finds nothing new doubles the wait, capped at
+    off_peak_interval, and the first cycle with new bookings resets it.
+    """
+
+    def __init__(self, peak_interval, off_peak_interval, peak_hours=(8, 22), timezone=None):
+        self.peak_interval = peak_interval
+        self.off_peak_interval = max(off_peak_interval, peak_interval)
+        self.peak_start, self.peak_end = peak_hours
+        self.timezone = None
+        if timezone:
+            try:
+                self.timezone = ZoneInfo(timezone)
+            except ZoneInfoNotFoundError:
+                logger.warning(f"Unknown timezone {timezone}, using local time for the scrape cadence")
+
+    @classmethod
+    def from_config(cls, timezone=None):
+        from config import (SCRAPE_INTERVAL_SECONDS, SCRAPE_OFF_PEAK_INTERVAL_SECONDS, SCRAPE_PEAK_HOURS,
+                            SCRAPE_TIMEZONE)
+        return cls(SCRAPE_INTERVAL_SECONDS, SCRAPE_OFF_PEAK_INTERVAL_SECONDS, parse_hours(SCRAPE_PEAK_HOURS),
+                   timezone or SCRAPE_TIMEZONE)
+
+    def is_peak(self, now=None):
+        hour = (now or datetime.now(self.timezone)).hour
+        if self.peak_start <= self.peak_end:
+            return self.peak_start <= hour < self.peak_end
+        return hour >= self.peak_start or hour < self.peak_end
+
+    def next_interval(self, idle_cycles=0, now=None):
+        base = self.peak_interval if self.is_peak(now) else self.off_peak_interval
+        return min(self.off_peak_interval, base * 2 ** min(idle_cycles, 16))
@@ -0,0 +1,56 @@
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlState:
+    """Per-target crawl progress, persisted to a JSON file so restarts pick up where the scraper stopped.
+
+    For each target it keeps the month being crawled, the newest article
+    stored by the last complete cycle (newest_url), the newest article of
+    the cycle in progress (cycle_top), the last listing page it reached
+    (last_page), whether a cycle is in progress and when a cycle last
+    completed (last_success, ISO format).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.targets = {}
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self.targets = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read crawl state {self.path}: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.targets, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def key(target):
+        return f"{target.state}/{target.county}/{target.url.rstrip('/')}"
+
+    def get(self, key):
+        with self.lock:
+            return dict(self.targets.get(key, {}))
+
+    def update(self, key, **values):
+        with self.lock:
+            self.targets.setdefault(key, {}).update(values)
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning(f"Could not save crawl state {self.path}: {e}")
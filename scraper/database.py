@@ -1,23 +1,50 @@
+from collections import Counter
 from datetime import date
-from bs4 import BeautifulSoup
-from sqlalchemy import create_engine, Column, BigInteger, Text, Date, DateTime, func
+import threading
+import time
+from sqlalchemy import create_engine, Column, BigInteger, Integer, Text, Date, DateTime, Index, UniqueConstraint, func, text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.exc import SQLAlchemyError
 import logging
 from config import DATABASE_URL
+from scraper.migrations import run_migrations
+from utils.metrics import instrument_engine, QUEUE_DEPTH
 
 logger = logging.getLogger(__name__)
 
-engine = create_engine(DATABASE_URL, pool_size=10, max_overflow=20)
-SessionFactory = sessionmaker(bind=engine)
-Session = scoped_session(SessionFactory)
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Create the engine on first use so importing this module stays cheap."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine(DATABASE_URL, pool_size=10, max_overflow=20)
+            instrument_engine(_engine)
+    return _engine
+
+
+SessionFactory = sessionmaker()
+Session = scoped_session(lambda: SessionFactory(bind=get_engine()))
 Base = declarative_base()
 
 class Mugshot(Base):
     __tablename__ = 'mugshots'
+    __table_args__ = (
+        UniqueConstraint('firstName', 'lastName', 'dateOfBooking', 'stateOfBooking', 'countyOfBooking',
+                         name='uq_mugshots_booking'),
+        # get_existing_mugshots: state/county scoped, optionally bounded by booking date
+        Index('ix_mugshots_state_county_booking', 'stateOfBooking', 'countyOfBooking', 'dateOfBooking'),
+        # get_todays_unprocessed_mugshots: only pending rows are ever polled
+        Index('ix_mugshots_pending_booking', 'dateOfBooking', postgresql_where=text("fb_status = 'pending'")),
+    )
 
-    id = Column(BigInteger, primary_key=True)
+    # SQLite only autoincrements an INTEGER PRIMARY KEY
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     firstName = Column(Text, server_default='')
     lastName = Column(Text, server_default='')
@@ -28,12 +55,20 @@ class Mugshot(Base):
     additionalDetails = Column(Text)
     imagePath = Column(Text)
     fb_status = Column(Text)
+    # JobQueue bookkeeping for the Facebook poster
+    attempts = Column(Integer, nullable=False, server_default='0')
+    lease_expires_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+    # Generated Facebook caption, kept so retries and reposts skip generation
+    caption = Column(Text)
 
 class DatabaseManager:
     @staticmethod
     def create_table_if_not_exists():
+        engine = get_engine()
         Base.metadata.create_all(engine)
         logger.info("Mugshots table created or already exists")
+        run_migrations(engine)
 
     @staticmethod
     def get_db_session():
@@ -54,6 +89,25 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @staticmethod
+    def insert_mugshots(mugshots_data):
+        if not mugshots_data:
+            return 0
+        session = Session()
+        try:
+            insert = sqlite.insert if get_engine().dialect.name == 'sqlite' else postgresql.insert
+            stmt = insert(Mugshot).values(mugshots_data).on_conflict_do_nothing()
+            result = session.execute(stmt)
+            session.commit()
+            logger.info(f"Inserted {result.rowcount} of {len(mugshots_data)} mugshots in one batch")
+            return result.rowcount
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to insert mugshot batch into database: {e}")
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
     @staticmethod
     def is_in_database(firstName, lastName, dateOfBooking):
         session = Session()
@@ -75,16 +129,21 @@ class DatabaseManager:
         Session.remove()
         
     @staticmethod
-    def get_existing_mugshots(state, county):
+    def get_existing_mugshots(state, county, since=None, until=None):
         with DatabaseManager.get_db_session() as session:
-            result = session.query(
+            query = session.query(
                 Mugshot.firstName,
                 Mugshot.lastName,
                 Mugshot.dateOfBooking
             ).filter(
                 Mugshot.stateOfBooking == state,
                 Mugshot.countyOfBooking == county
-            ).all()
+            )
+            if since is not None:
+                query = query.filter(Mugshot.dateOfBooking >= since)
+            if until is not None:
+                query = query.filter(Mugshot.dateOfBooking <= until)
+            result = query.all()
             return [{"firstName": r.firstName, "lastName": r.lastName, "dateOfBooking": r.dateOfBooking} for r in result]
 
     @staticmethod
@@ -103,46 +162,6 @@ class DatabaseManager:
             else:
                 logger.warning(f"Mugshot not found: {mugshot_id}")
 
-    @staticmethod
-    def parse_content(html_content):
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Extract additional details
-        additional_details = ""
-        dl_tag = soup.find('dl')
-        if dl_tag:
-            for dt, dd in zip(dl_tag.find_all('dt'), dl_tag.find_all('dd')):
-                additional_details += f"{dt.text.strip()}: {dd.text.strip()}\n"
-        
-        # Extract offense description
-        offense_description = ""
-        charges_section = soup.find(['h2', 'h3', 'h4'], text=lambda t: 'charges' in t.lower() if t else False)
-        
-        if charges_section:
-            next_element = charges_section.find_next()
-            while next_element and next_element.name not in ['h2', 'h3', 'h4']:
-                if next_element.name == 'p':
-                    offense_description += next_element.text.strip() + "\n"
-                elif next_element.name == 'ul':
-                    for li in next_element.find_all('li'):
-                        offense_description += f"- {li.text.strip()}\n"
-                next_element = next_element.next_sibling
-        
-        if not offense_description:
-            logger.warning("No offense description found. Checking for any content after additional details.")
-            last_dd = soup.find_all('dd')[-1] if soup.find_all('dd') else None
-            if last_dd:
-                next_element = last_dd.find_next()
-                while next_element:
-                    if next_element.name in ['p', 'div']:
-                        offense_description += next_element.text.strip() + "\n"
-                    next_element = next_element.next_sibling
-
-        logger.debug(f"Parsed Offense Description: {offense_description}")
-        logger.debug(f"Parsed Additional Details: {additional_details}")
-        
-        return offense_description.strip(), additional_details.strip()
-    
     @staticmethod
     def get_unprocessed_mugshots():
         session = Session()
@@ -176,4 +195,54 @@ class DatabaseManager:
                 Mugshot.dateOfBooking == today,
                 Mugshot.fb_status == 'pending'
             ).all()
-            return mugshots
\ No newline at end of file
+            return mugshots
+
+class MugshotBatchWriter:
+    """Buffers scraped records and writes them with DatabaseManager.insert_mugshots.
+
+    One writer can be shared by several scrapers. Each record is added under
+    an owner (the scraper's target), and unsaved(owner) counts that owner's
+    records not yet committed, whether still buffered, put back after a
+    failed insert or in the middle of another thread's flush.
+    """
+
+    def __init__(self, batch_size=50, flush_interval=30):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.pending = Counter()
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, mugshot_data, owner=None):
+        with self.lock:
+            self.buffer.append((owner, mugshot_data))
+            self.pending[owner] += 1
+            QUEUE_DEPTH.set(len(self.buffer), queue="db_batch")
+            due = len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self, raise_errors=False):
+        with self.lock:
+            batch, self.buffer = self.buffer, []
+            self.last_flush = time.monotonic()
+            QUEUE_DEPTH.set(0, queue="db_batch")
+        if not batch:
+            return 0
+        try:
+            inserted = DatabaseManager.insert_mugshots([mugshot_data for _, mugshot_data in batch])
+        except SQLAlchemyError:
+            # Keep the records so the next flush retries them
+            with self.lock:
+                self.buffer = batch + self.buffer
+            if raise_errors:
+                raise
+            return 0
+        with self.lock:
+            self.pending.subtract(owner for owner, _ in batch)
+        return inserted
+
+    def unsaved(self, owner=None):
+        with self.lock:
+            return self.pending[owner]
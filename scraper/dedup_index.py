@@ -0,0 +1,81 @@
+import threading
+import logging
+from datetime import timedelta
+from scraper.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+class DedupIndex:
+    """In-memory set of bookings already stored for one state/county.
+
+    Warm-loaded from the database for the booking window and then kept current
+    from the scraper's own inserts, so checking a listing title is a set lookup
+    instead of a query. Until the warm load succeeds, misses fall back to the
+    database.
+    """
+
+    def __init__(self, state, county, window_days=7):
+        self.state = state
+        self.county = county
+        self.window_days = window_days
+        self.keys = set()
+        self.window_start = None
+        self.loaded = False
+        # (start, end) booking date ranges loaded by preload(), e.g. for a backfill
+        self.ranges = []
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(firstName, lastName, dateOfBooking):
+        first = "".join(firstName.replace("'", "").lower().split())
+        last = "".join(lastName.replace("'", "").lower().split())
+        return (first, last, dateOfBooking)
+
+    def refresh(self, current_date):
+        window_start = current_date - timedelta(days=self.window_days)
+        if self.loaded and window_start == self.window_start:
+            return
+        try:
+            existing = DatabaseManager.get_existing_mugshots(self.state, self.county, since=window_start)
+        except Exception as e:
+            logger.error(f"Failed to warm-load dedup index for {self.county}, {self.state}: {e}")
+            return
+        keys = {self.make_key(r["firstName"], r["lastName"], r["dateOfBooking"]) for r in existing}
+        with self.lock:
+            self.keys = keys
+            self.ranges = []
+            self.window_start = window_start
+            self.loaded = True
+        logger.info(f"Loaded {len(keys)} bookings into dedup index for {self.county}, {self.state}")
+
+    def preload(self, start, end):
+        """Add every stored booking between start and end (inclusive) so lookups in that range skip the database."""
+        existing = DatabaseManager.get_existing_mugshots(self.state, self.county, since=start, until=end)
+        keys = {self.make_key(r["firstName"], r["lastName"], r["dateOfBooking"]) for r in existing}
+        with self.lock:
+            self.keys |= keys
+            self.ranges.append((start, end))
+        logger.info(f"Loaded {len(keys)} bookings from {start} to {end} into dedup index for {self.county}, {self.state}")
+
+    def contains(self, firstName, lastName, dateOfBooking):
+        key = self.make_key(firstName, lastName, dateOfBooking)
+        with self.lock:
+            if key in self.keys:
+                return True
+            if self.loaded and dateOfBooking >= self.window_start:
+                return False
+            if any(start <= dateOfBooking <= end for start, end in self.ranges):
+                return False
+        if DatabaseManager.is_in_database(firstName, lastName, dateOfBooking):
+            self.add(firstName, lastName, dateOfBooking)
+            return True
+        return False
+
+    def add(self, firstName, lastName, dateOfBooking):
+        with self.lock:
+            self.keys.add(self.make_key(firstName, lastName, dateOfBooking))
+
+    def discard(self, firstName, lastName, dateOfBooking):
+        with self.lock:
+            self.keys.discard(self.make_key(firstName, lastName, dateOfBooking))
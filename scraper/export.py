@@ -0,0 +1,254 @@
+import argparse
+import glob
+import gzip
+import json
+import logging
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import quote, unquote
+from sqlalchemy import select, or_, and_
+from config import EXPORT_DIR, EXPORT_BATCH_SIZE, EXPORT_SETTLE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+COLUMNS = ["id", "created_at", "firstName", "lastName", "dateOfBooking", "stateOfBooking", "countyOfBooking",
+           "offenseDescription", "additionalDetails", "imagePath", "fb_status"]
+STATE_FILE = "_export_state.json"
+
+
+def _schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("firstName", pa.string()),
+        ("lastName", pa.string()),
+        ("dateOfBooking", pa.date32()),
+        ("stateOfBooking", pa.string()),
+        ("countyOfBooking", pa.string()),
+        ("offenseDescription", pa.string()),
+        ("additionalDetails", pa.string()),
+        ("imagePath", pa.string()),
+        ("fb_status", pa.string()),
+    ])
+
+
+def partition_dir(directory, state, county, booking_date):
+    month = booking_date.strftime("%Y-%m") if booking_date else "unknown"
+    return os.path.join(directory, f"state={quote(state or '', safe='')}", f"county={quote(county or '', safe='')}",
+                        f"month={month}")
+
+
+def write_part(path, rows):
+    """Write rows to path (without extension) as Parquet, or gzipped JSON lines when pyarrow is missing."""
+    if PARQUET_AVAILABLE:
+        path += ".parquet"
+        pq.write_table(pa.Table.from_pylist(rows, schema=_schema()), f"{path}.tmp", compression="zstd")
+    else:
+        path += ".jsonl.gz"
+        with gzip.open(f"{path}.tmp", "wt", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=lambda value: value.isoformat()) + "\n")
+    return path
+
+
+def read_part(path, columns=None):
+    if path.endswith(".parquet"):
+        if not PARQUET_AVAILABLE:
+            raise RuntimeError(f"pyarrow is required to read {path}")
+        yield from pq.read_table(path, columns=columns).to_pylist()
+        return
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            if row.get("dateOfBooking"):
+                row["dateOfBooking"] = date.fromisoformat(row["dateOfBooking"])
+            if row.get("created_at"):
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+            yield {column: row.get(column) for column in columns} if columns else row
+
+
+class MugshotExporter:
+    """Incrementally copies the mugshots table into files partitioned by state, county and booking month.
+
+    Rows are streamed through a server-side cursor in batches and appended
+    as new part files, so nothing is ever loaded in full. The watermark
+    (created_at, id) of the last exported row is kept in _export_state.json;
+    rows younger than EXPORT_SETTLE_SECONDS are left for the next run so
+    transactions still committing are not skipped. Part files are written
+    under a .tmp name and only renamed once the new watermark is saved, so a
+    crashed run neither loses nor duplicates rows. fb_status is a copy as of
+    the export that picked the row up.
+    """
+
+    def __init__(self, directory=EXPORT_DIR, batch_size=EXPORT_BATCH_SIZE, settle_seconds=EXPORT_SETTLE_SECONDS):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.settle_seconds = settle_seconds
+        self.state_path = os.path.join(directory, STATE_FILE)
+        os.makedirs(directory, exist_ok=True)
+        self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"created_at": None, "id": 0, "pending": []}
+
+    def _save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _publish_pending(self):
+        for path in self.state["pending"]:
+            if os.path.exists(f"{path}.tmp"):
+                os.replace(f"{path}.tmp", path)
+        self.state["pending"] = []
+        self._save_state()
+
+    def _recover(self):
+        # Parts listed in the state belong to a committed run; any other .tmp file is from a run that crashed
+        self._publish_pending()
+        for path in glob.glob(os.path.join(self.directory, "state=*", "county=*", "month=*", "*.tmp")):
+            os.remove(path)
+
+    def _query(self, mugshots):
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.settle_seconds)
+        query = select(*[mugshots.c[column] for column in COLUMNS]).where(mugshots.c.created_at < cutoff)
+        if self.state["created_at"]:
+            last_created_at = datetime.fromisoformat(self.state["created_at"])
+            query = query.where(or_(
+                mugshots.c.created_at > last_created_at,
+                and_(mugshots.c.created_at == last_created_at, mugshots.c.id > self.state["id"]),
+            ))
+        return query.order_by(mugshots.c.created_at, mugshots.c.id)
+
+    def run(self):
+        from scraper.database import Mugshot, get_engine
+        from utils.metrics import RECORDS
+
+        self._recover()
+        run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        buffers = {}
+        written = []
+        exported = 0
+        last_row = None
+
+        def flush(partition):
+            rows = buffers.pop(partition)
+            path = os.path.join(partition, f"part-{run_id}-{len(written):05d}")
+            os.makedirs(partition, exist_ok=True)
+            written.append(write_part(path, rows))
+
+        with get_engine().connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=self.batch_size).execute(
+                self._query(Mugshot.__table__)
+            )
+            for batch in result.partitions():
+                for row in batch:
+                    row = dict(row._mapping)
+                    partition = partition_dir(self.directory, row["stateOfBooking"], row["countyOfBooking"],
+                                              row["dateOfBooking"])
+                    buffers.setdefault(partition, []).append(row)
+                    if len(buffers[partition]) >= self.batch_size:
+                        flush(partition)
+                    last_row = row
+                exported += len(batch)
+                logger.info(f"Exported {exported} rows")
+
+        for partition in list(buffers):
+            flush(partition)
+        if last_row is None:
+            logger.info("No new rows to export")
+            return 0
+
+        self.state.update(created_at=last_row["created_at"].isoformat(), id=last_row["id"], pending=written)
+        self._save_state()
+        self._publish_pending()
+        RECORDS.inc(exported, stage="exported")
+        logger.info(f"Exported {exported} rows into {len(written)} files")
+        return exported
+
+
+class ExportReader:
+    """Read-only queries over the exported files; partitions outside the filters are never opened."""
+
+    def __init__(self, directory=EXPORT_DIR):
+        self.directory = directory
+
+    def files(self, state=None, county=None, month_from=None, month_to=None):
+        for path in sorted(glob.glob(os.path.join(self.directory, "state=*", "county=*", "month=*", "part-*"))):
+            if path.endswith(".tmp"):
+                continue
+            month_dir = os.path.dirname(path)
+            county_dir = os.path.dirname(month_dir)
+            state_dir = os.path.dirname(county_dir)
+            month = os.path.basename(month_dir).split("=", 1)[1]
+            if state is not None and unquote(os.path.basename(state_dir).split("=", 1)[1]) != state:
+                continue
+            if county is not None and unquote(os.path.basename(county_dir).split("=", 1)[1]) != county:
+                continue
+            if month_from is not None and month < month_from:
+                continue
+            if month_to is not None and month > month_to:
+                continue
+            yield path
+
+    def scan(self, state=None, county=None, month_from=None, month_to=None, columns=None):
+        """Yield rows as dicts. Months are "YYYY-MM" strings and both bounds are inclusive."""
+        for path in self.files(state, county, month_from, month_to):
+            yield from read_part(path, columns)
+
+    def bookings_per_day(self, state=None, county=None, month_from=None, month_to=None):
+        counts = Counter()
+        columns = ["stateOfBooking", "countyOfBooking", "dateOfBooking"]
+        for row in self.scan(state, county, month_from, month_to, columns):
+            counts[(row["stateOfBooking"], row["countyOfBooking"], row["dateOfBooking"])] += 1
+        return sorted(counts.items())
+
+    def charge_frequencies(self, state=None, county=None, month_from=None, month_to=None, top=20):
+        counts = Counter()
+        for row in self.scan(state, county, month_from, month_to, ["offenseDescription"]):
+            # Charges are stored one per line, list items with a "- " prefix
+            for line in (row["offenseDescription"] or "").splitlines():
+                charge = line.strip().removeprefix("- ").strip()
+                if charge:
+                    counts[charge] += 1
+        return counts.most_common(top)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the mugshots table for analytics and query the export.")
+    parser.add_argument("--dir", default=EXPORT_DIR, help="export directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("run", help="append rows created since the last export")
+    for name in ("bookings-per-day", "charges"):
+        query = commands.add_parser(name)
+        query.add_argument("--state")
+        query.add_argument("--county")
+        query.add_argument("--from", dest="month_from", help="first month, YYYY-MM")
+        query.add_argument("--to", dest="month_to", help="last month, YYYY-MM")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == "run":
+        MugshotExporter(args.dir).run()
+    else:
+        reader = ExportReader(args.dir)
+        filters = (args.state, args.county, args.month_from, args.month_to)
+        if args.command == "bookings-per-day":
+            for (state, county, booking_date), count in reader.bookings_per_day(*filters):
+                print(f"{state}\t{county}\t{booking_date}\t{count}")
+        else:
+            for charge, count in reader.charge_frequencies(*filters):
+                print(f"{count}\t{charge}")
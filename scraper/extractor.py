@@ -0,0 +1,177 @@
+import re
+import logging
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import soupsieve
+from scraper.html_parser import article_strainer
+
+logger = logging.getLogger(__name__)
+
+AMOUNT_PATTERN = re.compile(r'\$\s*([\d,]+(?:\.\d+)?)')
+# A line that is only a bond ("Bond: $500") belongs to the charge listed above it
+BOND_LINE = re.compile(r'^\s*bond\b', re.IGNORECASE)
+TOTAL_LABEL = re.compile(r'\btotal\b', re.IGNORECASE)
+WRAPPER_TAGS = ('div', 'section', 'article')
+
+
+class ExtractionRules:
+    """Selectors and patterns for one family of county sites, compiled once."""
+
+    def __init__(self, title_selector='h1', image_selector='img.attachment-full',
+                 content_selector='div.entry-content', details_selector='dl',
+                 heading_selector='h2, h3, h4', charges_heading=r'charges',
+                 charge_selector='li', bond_label=r'bond', date_format='%m/%d/%Y'):
+        self.title = soupsieve.compile(title_selector)
+        self.image = soupsieve.compile(image_selector)
+        self.content = soupsieve.compile(content_selector)
+        self.details = soupsieve.compile(details_selector)
+        self.heading = soupsieve.compile(heading_selector)
+        self.charge = soupsieve.compile(charge_selector)
+        self.block = soupsieve.compile(f"{heading_selector}, {details_selector}")
+        self.charges_heading = re.compile(charges_heading, re.IGNORECASE)
+        self.bond_label = re.compile(bond_label, re.IGNORECASE)
+        self.date_format = date_format
+        # Article pages are parsed keeping only what these selectors need
+        self.strainer = article_strainer([title_selector, image_selector, content_selector])
+
+
+RULES = {
+    # WordPress "mugshots.zone" county sites
+    'default': ExtractionRules(),
+}
+
+
+def get_rules(name='default', overrides=None):
+    if overrides:
+        return ExtractionRules(**overrides)
+    return RULES[name]
+
+
+class ContentExtractor:
+    def __init__(self, rules=None):
+        self.rules = rules or RULES['default']
+
+    def extract_title(self, soup):
+        """Split an 'First Middle Last MM/DD/YYYY' headline into its parts."""
+        title = self.rules.title.select_one(soup).text.strip()
+        name_parts = title.split()
+        date_str = name_parts[-1]
+        return {
+            "firstName": name_parts[0],
+            "lastName": " ".join(name_parts[1:-1]),
+            "date_str": date_str,
+            "dateOfBooking": datetime.strptime(date_str, self.rules.date_format).date(),
+        }
+
+    def extract_image_url(self, soup):
+        img_tag = self.rules.image.select_one(soup)
+        return img_tag['src'] if img_tag and 'src' in img_tag.attrs else None
+
+    def _blocks(self, node):
+        # Descend into layout wrappers so headings and lists nested in them are still seen in order
+        for child in node.children:
+            if not getattr(child, 'name', None):
+                continue
+            if child.name in WRAPPER_TAGS and self.rules.block.select_one(child):
+                yield from self._blocks(child)
+            else:
+                yield child
+
+    def extract_content(self, content):
+        """Extract details, charges and bond from the post body in one pass over its blocks."""
+        details = []
+        charge_lines = []
+        trailing_lines = []
+        in_charges = False
+        after_details = False
+
+        if content is not None:
+            for block in self._blocks(content):
+                if self.rules.heading.match(block):
+                    in_charges = bool(self.rules.charges_heading.search(block.text))
+                    continue
+                if in_charges:
+                    if block.name == 'p':
+                        charge_lines.append((block.text.strip(), False))
+                    elif block.name == 'ul':
+                        charge_lines.extend((li.text.strip(), True) for li in self.rules.charge.select(block))
+                elif self.rules.details.match(block):
+                    details.extend(
+                        (dt.text.strip(), dd.text.strip())
+                        for dt, dd in zip(block.find_all('dt'), block.find_all('dd'))
+                    )
+                    after_details = True
+                elif after_details and block.name in ('p', 'div'):
+                    trailing_lines.append(block.text.strip())
+
+        if charge_lines:
+            offense_description = "\n".join(f"- {text}" if is_item else text for text, is_item in charge_lines)
+            charges = [text for text, _ in charge_lines if text]
+        else:
+            logger.warning("No offense description found. Checking for any content after additional details.")
+            offense_description = "\n".join(trailing_lines)
+            charges = [line for line in trailing_lines if line]
+
+        additional_details = "\n".join(f"{label}: {value}" for label, value in details)
+
+        detail_bonds = [f"{label}: {value}" for label, value in details if self.rules.bond_label.search(label)]
+        charge_bonds = charge_bond_texts(charges, self.rules.bond_label)
+
+        logger.debug(f"Parsed Offense Description: {offense_description}")
+        logger.debug(f"Parsed Additional Details: {additional_details}")
+
+        return {
+            "offense_description": offense_description.strip(),
+            "additional_details": additional_details.strip(),
+            "charges": charges,
+            "details": dict(details),
+            "bond_amount": total_bond(detail_bonds, charge_bonds),
+        }
+
+    def extract(self, soup):
+        record = self.extract_title(soup)
+        record["image_url"] = self.extract_image_url(soup)
+        record.update(self.extract_content(self.rules.content.select_one(soup)))
+        return record
+
+
+def charge_bond_texts(lines, bond_label=re.compile(r'bond', re.IGNORECASE)):
+    """The bond texts among charge lines, counting a charge listed more than once only once."""
+    texts = []
+    seen = set()
+    duplicate = False
+    for line in lines:
+        text = line.strip().lstrip("-").strip()
+        if not text:
+            continue
+        if not BOND_LINE.match(text):
+            duplicate = text in seen
+            seen.add(text)
+        if not duplicate and bond_label.search(text):
+            texts.append(text)
+    return texts
+
+
+def total_bond(detail_texts, charge_texts):
+    """Sum the per-charge bonds; only when no charge lists one, fall back to the booking details.
+
+    Among the details, a "Total Bond" line is used on its own rather than added to the others.
+    """
+    amount = parse_bond_amount(charge_texts)
+    if amount is not None:
+        return amount
+    totals = [text for text in detail_texts if TOTAL_LABEL.search(text)]
+    return parse_bond_amount(totals or detail_texts)
+
+
+def parse_bond_amount(texts):
+    """Sum every dollar amount in the given texts, or None when there is none."""
+    total = None
+    for text in texts:
+        for amount in AMOUNT_PATTERN.findall(text):
+            try:
+                value = Decimal(amount.replace(',', ''))
+            except InvalidOperation:
+                continue
+            total = value if total is None else total + value
+    return total
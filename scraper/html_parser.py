@@ -0,0 +1,82 @@
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+
+# lxml builds trees several times faster than the stdlib parser; use it when installed
+try:
+    import lxml  # noqa: F401
+    PARSER = 'lxml'
+except ImportError:
+    PARSER = 'html.parser'
+
+
+def _classes(attrs):
+    value = attrs.get('class') or ''
+    if isinstance(value, str):
+        return value.split()
+    return value
+
+
+def _is_listing_title(name, attrs):
+    return name == 'h2' and 'entry-title' in _classes(attrs)
+
+
+class TagStrainer(SoupStrainer):
+    """SoupStrainer that builds only top-level tags accepted by predicate(name, attrs).
+
+    beautifulsoup4 4.13 stopped passing attributes to name functions, so the
+    hook that decides whether a tag is built is overridden for both APIs.
+    """
+
+    def __init__(self, predicate):
+        super().__init__()
+        self.predicate = predicate
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        # beautifulsoup4 >= 4.13
+        return self.predicate(name, attrs or {})
+
+    def search_tag(self, markup_name=None, markup_attrs={}):
+        # beautifulsoup4 < 4.13 calls this with the raw name and attributes while parsing
+        if isinstance(markup_name, str):
+            return markup_name if self.predicate(markup_name, dict(markup_attrs)) else None
+        return super().search_tag(markup_name, markup_attrs)
+
+
+# "tag", ".class" or "tag.class.other": the only selectors a strainer can check before the tag is built
+SIMPLE_SELECTOR = re.compile(r'^([a-zA-Z][\w-]*)?((?:\.[\w-]+)*)$')
+
+
+def article_strainer(selectors):
+    """Strainer that builds only the subtrees matched by the given CSS selectors.
+
+    Returns None, meaning parse the whole page, when any selector is more
+    than a tag name with classes (descendants, ids, attributes...), since
+    those can't be decided from a single start tag.
+    """
+    parts = []
+    for selector in selectors:
+        for part in selector.split(','):
+            match = SIMPLE_SELECTOR.match(part.strip())
+            if not match or not any(match.groups()):
+                return None
+            parts.append((match.group(1), set(match.group(2).split('.')[1:])))
+
+    def wanted(name, attrs):
+        classes = set(_classes(attrs))
+        return any((tag is None or tag == name) and required <= classes for tag, required in parts)
+
+    return TagStrainer(wanted)
+
+
+# Only these subtrees are built; everything else in the page is skipped while parsing
+LISTING_STRAINER = TagStrainer(_is_listing_title)
+ARTICLE_STRAINER = article_strainer(['h1', 'img.attachment-full', 'div.entry-content'])
+
+
+def parse_listing(content):
+    return BeautifulSoup(content, PARSER, parse_only=LISTING_STRAINER)
+
+
+def parse_article(content, strainer=ARTICLE_STRAINER):
+    """Parse an article page; pass the target's ExtractionRules.strainer when its selectors are overridden."""
+    return BeautifulSoup(content, PARSER, parse_only=strainer)
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class HttpCache:
+    """Validators and content hashes for listing pages, persisted to a JSON file.
+
+    Entries older than max_age are ignored so that a page is fully re-parsed
+    now and then. A changed page is only staged by is_unchanged; the scraper
+    commits it once every article from the page is stored, or forgets it so
+    the next cycle parses the page again and retries what failed.
+    """
+
+    def __init__(self, path, max_age=3600):
+        self.path = path
+        self.max_age = max_age
+        self.entries = {}
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read HTTP cache {self.path}: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+    def _fresh_entry(self, url):
+        entry = self.entries.get(url)
+        if entry and time.time() - entry["stored_at"] < self.max_age:
+            return entry
+        return None
+
+    def conditional_headers(self, url):
+        with self.lock:
+            entry = self._fresh_entry(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_unchanged(self, url, response):
+        """Stage the response and report whether it matches what was cached."""
+        with self.lock:
+            entry = self._fresh_entry(url)
+            if response.status_code == 304:
+                unchanged = entry is not None
+            else:
+                content_hash = hashlib.sha256(response.content).hexdigest()
+                unchanged = entry is not None and entry["content_hash"] == content_hash
+                if not unchanged:
+                    self.pending[url] = {
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "content_hash": content_hash,
+                        "stored_at": time.time(),
+                    }
+            if unchanged:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return unchanged
+
+    def commit(self, urls):
+        """Keep the staged entries for urls; their articles have all been processed."""
+        with self.lock:
+            for url in urls:
+                if url in self.pending:
+                    self.entries[url] = self.pending.pop(url)
+            self._save()
+
+    def forget(self, urls):
+        """Drop staged and stored entries for urls so the next fetch parses them again."""
+        with self.lock:
+            for url in urls:
+                self.pending.pop(url, None)
+                self.entries.pop(url, None)
+            self._save()
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
@@ -0,0 +1,55 @@
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ImageIndex:
+    """Local record of uploaded mugshots, keyed by content hash.
+
+    An exact SHA-256 match means the image is already in storage, so both the
+    existence check and the upload can be skipped. Perceptual hashes are kept
+    in memory to flag near-duplicates, such as the same mugshot republished
+    under a slightly different title.
+    """
+
+    def __init__(self, path, max_distance=6):
+        self.max_distance = max_distance
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS images (
+                sha256 TEXT PRIMARY KEY,
+                phash TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                url TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        self.conn.commit()
+        self.phashes = [
+            (int(phash, 16), filename)
+            for phash, filename in self.conn.execute("SELECT phash, filename FROM images")
+        ]
+
+    def lookup(self, sha256):
+        with self.lock:
+            row = self.conn.execute("SELECT url FROM images WHERE sha256 = ?", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def find_similar(self, phash):
+        """Filenames of stored images within max_distance bits of phash."""
+        with self.lock:
+            candidates = list(self.phashes)
+        return [filename for other, filename in candidates if bin(phash ^ other).count("1") <= self.max_distance]
+
+    def add(self, sha256, phash, filename, url):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO images (sha256, phash, filename, url, created_at) VALUES (?, ?, ?, ?, ?)",
+                (sha256, f"{phash:016x}", filename, url, time.time())
+            )
+            self.conn.commit()
+            self.phashes.append((phash, filename))
@@ -0,0 +1,211 @@
+import logging
+import select
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import or_, and_
+from sqlalchemy.exc import SQLAlchemyError
+from scraper.database import Session, Mugshot, get_engine
+from utils.metrics import RECORDS, QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'mugshots_pending'
+
+
+class JobQueue:
+    """Leased work queue over the mugshots table for Facebook poster workers.
+
+    A record moves pending -> generating -> posting -> posted, or to failed once
+    it runs out of attempts. Claims use SELECT ... FOR UPDATE SKIP LOCKED so
+    several workers never take the same row. A worker that dies while
+    generating loses its lease and the row is claimed again; one that dies
+    while posting may already have posted, so that row is marked failed
+    rather than risk a duplicate post.
+
+    On Postgres, new rows are announced with LISTEN/NOTIFY. On SQLite (for
+    local runs) the same queries work because writers are serialized, and
+    waiting falls back to a short poll.
+    """
+
+    def __init__(self, worker_id, lease_seconds=300, max_attempts=5):
+        self.worker_id = worker_id
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.listen_conn = None
+
+    def claim(self, today):
+        session = Session()
+        try:
+            now = datetime.now(timezone.utc)
+            mugshot = session.query(Mugshot).filter(
+                Mugshot.dateOfBooking == today,
+                Mugshot.attempts < self.max_attempts,
+                or_(
+                    Mugshot.fb_status == 'pending',
+                    and_(Mugshot.fb_status == 'generating', Mugshot.lease_expires_at < now)
+                )
+            ).order_by(Mugshot.id).with_for_update(skip_locked=True).first()
+            if mugshot is None:
+                session.rollback()
+                return None
+            mugshot.fb_status = 'generating'
+            mugshot.lease_expires_at = now + self.lease
+            mugshot.attempts = mugshot.attempts + 1
+            session.commit()
+            session.refresh(mugshot)
+            session.expunge(mugshot)
+            logger.info(f"{self.worker_id} claimed mugshot {mugshot.id} (attempt {mugshot.attempts})")
+            return mugshot
+        except SQLAlchemyError as e:
+            logger.error(f"Error claiming mugshot: {e}")
+            session.rollback()
+            return None
+        finally:
+            session.close()
+
+    def claim_many(self, today, limit, lease_seconds):
+        """Claim up to limit pending records at once with a longer lease, for batch caption generation."""
+        session = Session()
+        try:
+            now = datetime.now(timezone.utc)
+            mugshots = session.query(Mugshot).filter(
+                Mugshot.dateOfBooking == today,
+                Mugshot.fb_status == 'pending',
+                Mugshot.caption.is_(None),
+                Mugshot.attempts < self.max_attempts
+            ).order_by(Mugshot.id).limit(limit).with_for_update(skip_locked=True).all()
+            for mugshot in mugshots:
+                mugshot.fb_status = 'generating'
+                mugshot.lease_expires_at = now + timedelta(seconds=lease_seconds)
+                mugshot.attempts = mugshot.attempts + 1
+            session.commit()
+            for mugshot in mugshots:
+                session.refresh(mugshot)
+                session.expunge(mugshot)
+            if mugshots:
+                logger.info(f"{self.worker_id} claimed {len(mugshots)} mugshots for batch generation")
+            return mugshots
+        except SQLAlchemyError as e:
+            logger.error(f"Error claiming mugshots: {e}")
+            session.rollback()
+            return []
+        finally:
+            session.close()
+
+    def count_pending(self, today):
+        session = Session()
+        try:
+            pending = session.query(Mugshot).filter(
+                Mugshot.dateOfBooking == today,
+                Mugshot.fb_status == 'pending',
+                Mugshot.caption.is_(None)
+            ).count()
+            QUEUE_DEPTH.set(pending, queue="uncaptioned")
+            return pending
+        finally:
+            session.close()
+
+    def _transition(self, mugshot_id, from_statuses, claimed_attempts, **values):
+        """Update a record this worker claimed; False if it is no longer ours.
+
+        claimed_attempts is the attempt count the claim set. A worker that
+        re-claimed the row after our lease expired has bumped it, so a stale
+        worker can never move the row out from under the new owner.
+        """
+        session = Session()
+        try:
+            updated = session.query(Mugshot).filter(
+                Mugshot.id == mugshot_id,
+                Mugshot.fb_status.in_(from_statuses),
+                Mugshot.attempts == claimed_attempts
+            ).update(values, synchronize_session=False)
+            session.commit()
+            return updated == 1
+        except SQLAlchemyError as e:
+            logger.error(f"Error updating mugshot {mugshot_id} to {values.get('fb_status')}: {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    def mark_posting(self, mugshot_id, claimed_attempts):
+        return self._transition(mugshot_id, ['generating'], claimed_attempts, fb_status='posting',
+                                lease_expires_at=datetime.now(timezone.utc) + self.lease)
+
+    def renew(self, mugshot_id, claimed_attempts, extra_seconds=0):
+        """Extend this worker's lease on a claimed record; False if it was lost to another worker."""
+        return self._transition(mugshot_id, ['generating'], claimed_attempts,
+                                lease_expires_at=datetime.now(timezone.utc) + self.lease
+                                + timedelta(seconds=extra_seconds))
+
+    def save_caption(self, mugshot_id, claimed_attempts, caption):
+        return self._transition(mugshot_id, ['generating'], claimed_attempts, caption=caption)
+
+    def complete(self, mugshot_id, claimed_attempts):
+        done = self._transition(mugshot_id, ['posting'], claimed_attempts, fb_status='posted', lease_expires_at=None,
+                                last_error=None)
+        if done:
+            RECORDS.inc(stage="posted")
+            logger.info(f"Marked mugshot as processed: {mugshot_id}")
+        return done
+
+    def fail(self, mugshot_id, error, attempts, retry=True):
+        """Return the record to pending for another try, or mark it failed after max_attempts.
+
+        Pass retry=False when the post may have gone through, so it is never posted twice.
+        """
+        status = 'failed' if attempts >= self.max_attempts or not retry else 'pending'
+        RECORDS.inc(stage="post_failed" if status == 'failed' else "post_retried")
+        logger.warning(f"Mugshot {mugshot_id} -> {status}: {error}")
+        return self._transition(mugshot_id, ['generating', 'posting'], attempts, fb_status=status,
+                                lease_expires_at=None, last_error=str(error))
+
+    def release(self, mugshot_id, claimed_attempts):
+        """Hand a claimed record back untouched, e.g. on shutdown, without using up an attempt."""
+        return self._transition(mugshot_id, ['generating'], claimed_attempts, fb_status='pending',
+                                lease_expires_at=None, attempts=claimed_attempts - 1)
+
+    def recover_expired_posts(self):
+        """Fail rows whose lease expired mid-post, or mid-generation on their last attempt."""
+        session = Session()
+        try:
+            updated = session.query(Mugshot).filter(
+                Mugshot.lease_expires_at < datetime.now(timezone.utc),
+                or_(
+                    Mugshot.fb_status == 'posting',
+                    and_(Mugshot.fb_status == 'generating', Mugshot.attempts >= self.max_attempts)
+                )
+            ).update({
+                "fb_status": 'failed',
+                "last_error": 'Lease expired; if it was posting, the post may already be live',
+            }, synchronize_session=False)
+            session.commit()
+            if updated:
+                logger.warning(f"Marked {updated} mugshots with expired leases as failed")
+            return updated
+        except SQLAlchemyError as e:
+            logger.error(f"Error recovering expired posts: {e}")
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+
+    def wait_for_jobs(self, timeout):
+        """Block until a new pending row is announced or timeout seconds pass."""
+        if get_engine().dialect.name != 'postgresql':
+            time.sleep(min(timeout, 1))
+            return
+        try:
+            if self.listen_conn is None:
+                # Keep the pool proxy referenced so the connection is not handed back to the pool
+                self.listen_conn = get_engine().raw_connection()
+                self.listen_conn.dbapi_connection.autocommit = True
+                self.listen_conn.dbapi_connection.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+            dbapi_conn = self.listen_conn.dbapi_connection
+            if select.select([dbapi_conn], [], [], timeout)[0]:
+                dbapi_conn.poll()
+                dbapi_conn.notifies.clear()
+        except Exception as e:
+            logger.error(f"Error waiting for new mugshots: {e}")
+            self.listen_conn = None
+            time.sleep(min(timeout, 5))
@@ -0,0 +1,98 @@
+import logging
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Ordered schema changes for tables that already exist. Base.metadata.create_all
+# only creates missing tables, so anything added to the models after a
+# deployment went live has to be applied here as well. Every statement must be
+# safe to run against a table that create_all has just built.
+MIGRATIONS = [
+    (1, "Unique booking key and hot-query indexes on mugshots", [
+        # Drop duplicate bookings so the unique constraint can be added, keeping the oldest row
+        '''
+        DELETE FROM mugshots a
+        USING mugshots b
+        WHERE a.id > b.id
+          AND a."firstName" = b."firstName"
+          AND a."lastName" = b."lastName"
+          AND a."dateOfBooking" = b."dateOfBooking"
+          AND a."stateOfBooking" = b."stateOfBooking"
+          AND a."countyOfBooking" = b."countyOfBooking"
+        ''',
+        '''
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_mugshots_booking') THEN
+                ALTER TABLE mugshots ADD CONSTRAINT uq_mugshots_booking
+                    UNIQUE ("firstName", "lastName", "dateOfBooking", "stateOfBooking", "countyOfBooking");
+            END IF;
+        END $$;
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS ix_mugshots_state_county_booking
+            ON mugshots ("stateOfBooking", "countyOfBooking", "dateOfBooking")
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS ix_mugshots_pending_booking
+            ON mugshots ("dateOfBooking")
+            WHERE fb_status = 'pending'
+        ''',
+    ]),
+    (2, "Job queue columns and new-row notification for the Facebook poster", [
+        'ALTER TABLE mugshots ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE mugshots ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ',
+        'ALTER TABLE mugshots ADD COLUMN IF NOT EXISTS last_error TEXT',
+        '''
+        CREATE OR REPLACE FUNCTION notify_mugshots_pending() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('mugshots_pending', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        'DROP TRIGGER IF EXISTS mugshots_pending_notify ON mugshots',
+        '''
+        CREATE TRIGGER mugshots_pending_notify
+            AFTER INSERT ON mugshots
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_mugshots_pending()
+        ''',
+    ]),
+    (3, "Stored caption on mugshots", [
+        'ALTER TABLE mugshots ADD COLUMN IF NOT EXISTS caption TEXT',
+    ]),
+]
+
+
+def run_migrations(engine):
+    if engine.dialect.name != 'postgresql':
+        # Local SQLite databases are always built fresh by create_all
+        return
+    with engine.begin() as conn:
+        conn.execute(text('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMPTZ DEFAULT now()
+            )
+        '''))
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    for version, description, statements in MIGRATIONS:
+        if version in applied:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                {"version": version, "description": description}
+            )
+        logger.info(f"Migration {version} applied")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from scraper.database import get_engine
+    run_migrations(get_engine())
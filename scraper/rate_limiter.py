@@ -0,0 +1,166 @@
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """Token bucket that adjusts its rate to how the server responds.
+
+    Each healthy response raises the rate by `increase` up to max_rate; a
+    throttling response (429, 5xx, connection errors) multiplies it by
+    `decrease` down to min_rate and drops any saved-up burst. A Retry-After
+    value pauses the bucket entirely until it has passed.
+    """
+
+    def __init__(self, rate: float, capacity: int, min_rate: float, max_rate: float, increase: float = 0.05,
+                 decrease: float = 0.5):
+        super().__init__(rate, capacity)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.blocked_until = 0.0
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait_time = self.blocked_until - now
+                else:
+                    self._refill()
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+    def on_success(self):
+        with self.lock:
+            if time.monotonic() >= self.blocked_until:
+                self._refill()
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: float = None):
+        with self.lock:
+            now = time.monotonic()
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = 0.0
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            # Tokens start accruing again once any pause is over
+            self.last_refill = max(now, self.blocked_until)
+
+
+class HostRateLimiter:
+    """Per-host concurrency cap plus an adaptive token-bucket request rate.
+
+    Callers report each outcome with feedback() so the host's rate follows
+    the server: it creeps up towards max_rate while responses are healthy
+    and halves on 429/5xx, honouring Retry-After.
+    """
+
+    def __init__(self, rate: float, burst: int, concurrency: int, max_rate: float = None, min_rate: float = None):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.max_rate = max_rate or rate
+        self.min_rate = min_rate or rate / 10
+        self.buckets = {}
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def _get_host_limits(self, host):
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = AdaptiveTokenBucket(self.rate, self.burst, self.min_rate, self.max_rate)
+                self.semaphores[host] = threading.BoundedSemaphore(self.concurrency)
+            return self.buckets[host], self.semaphores[host]
+
+    @contextmanager
+    def limit(self, url):
+        bucket, semaphore = self._get_host_limits(urlparse(url).netloc)
+        with semaphore:
+            bucket.acquire()
+            yield
+
+    def feedback(self, url, status_code=None, retry_after=None):
+        """Report a response status, or None for a connection error or timeout."""
+        bucket, _ = self._get_host_limits(urlparse(url).netloc)
+        if status_code is None or status_code in THROTTLE_STATUSES:
+            bucket.on_throttle(parse_retry_after(retry_after))
+        elif status_code < 400:
+            bucket.on_success()
+
+    def current_rate(self, url):
+        bucket, _ = self._get_host_limits(urlparse(url).netloc)
+        return bucket.rate
+
+
+class AdaptiveInterval:
+    """Minimum spacing between calls to an API that rate-limits per account, such as the Graph API.
+
+    Starts at min_interval, doubles (up to max_interval) each time the API
+    reports throttling and shrinks back by `recovery` after each success.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, recovery: float = 0.8):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.recovery = recovery
+        self.interval = min_interval
+        self.paused_until = 0.0
+
+    def on_success(self):
+        self.interval = max(self.min_interval, self.interval * self.recovery)
+
+    def on_throttle(self, retry_after: float = None):
+        self.interval = min(self.max_interval, self.interval * 2)
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def next_start(self, started_at: float) -> float:
+        """Monotonic time at which the call after one started at started_at may begin."""
+        return max(started_at + self.interval, self.paused_until)
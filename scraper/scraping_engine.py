@@ -0,0 +1,102 @@
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from scraper.database import MugshotBatchWriter
+from scraper.scraping_target import ScrapingTarget, load_targets
+from scraper.website_scraper import WebsiteScraper
+from scraper.http_cache import HttpCache
+from scraper.image_index import ImageIndex
+from scraper.upload_pool import UploadPool
+from scraper.storage import get_storage
+from scraper.cadence import ScrapeCadence
+from scraper.crawl_state import CrawlState
+from config import (BASE_URL, STATE, COUNTY, TARGETS_FILE, MAX_PARALLEL_TARGETS,
+                    SCRAPER_CONCURRENCY, DB_BATCH_SIZE, DB_BATCH_FLUSH_SECONDS, HTTP_CACHE_FILE, HTTP_CACHE_MAX_AGE,
+                    IMAGE_INDEX_FILE, PHASH_MAX_DISTANCE, UPLOAD_WORKERS, UPLOAD_MAX_PENDING, UPLOAD_MAX_RETRIES,
+                    CRAWL_STATE_FILE)
+
+
+class ScrapingEngine:
+    """Runs one WebsiteScraper per ScrapingTarget inside a single process.
+
+    Each target is scheduled by its own ScrapeCadence; listing walks run in a
+    bounded pool, article and image fetches share a second pool, and all
+    targets share one storage backend, upload pool, batch writer, HTTP cache,
+    image index and crawl state, plus the module-level database pool.
+    """
+
+    def __init__(self, logger, targets=None):
+        self.logger = logger
+        self.targets = targets or load_targets(TARGETS_FILE, ScrapingTarget(STATE, COUNTY, BASE_URL))
+        self.target_executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_TARGETS)
+        self.article_executor = ThreadPoolExecutor(max_workers=SCRAPER_CONCURRENCY * len(self.targets))
+        self.batch_writer = MugshotBatchWriter(DB_BATCH_SIZE, DB_BATCH_FLUSH_SECONDS)
+        self.http_cache = HttpCache(HTTP_CACHE_FILE, HTTP_CACHE_MAX_AGE)
+        self.image_index = ImageIndex(IMAGE_INDEX_FILE, PHASH_MAX_DISTANCE)
+        self.crawl_state = CrawlState(CRAWL_STATE_FILE)
+        self.storage = get_storage()
+        self.upload_pool = UploadPool(
+            self.storage.upload, UPLOAD_WORKERS, UPLOAD_MAX_PENDING, UPLOAD_MAX_RETRIES
+        )
+        self.scrapers = [
+            WebsiteScraper(logger, target, executor=self.article_executor, batch_writer=self.batch_writer,
+                           http_cache=self.http_cache, image_index=self.image_index,
+                           upload_pool=self.upload_pool, crawl_state=self.crawl_state)
+            for target in self.targets
+        ]
+        self.cadences = {id(scraper): ScrapeCadence.from_config(scraper.target.timezone) for scraper in self.scrapers}
+        self.idle_cycles = {id(scraper): 0 for scraper in self.scrapers}
+        self.next_run = {id(scraper): self._first_run(scraper) for scraper in self.scrapers}
+        self.in_flight = {}
+
+    def _first_run(self, scraper):
+        # After a restart, wait out the rest of the interval since the last finished cycle;
+        # an interrupted cycle resumes straight away
+        saved = self.crawl_state.get(scraper.state_key)
+        if saved.get("in_progress") or not saved.get("last_success"):
+            return 0
+        elapsed = (datetime.now() - datetime.fromisoformat(saved["last_success"])).total_seconds()
+        wait_seconds = self.cadences[id(scraper)].next_interval() - elapsed
+        if wait_seconds > 0:
+            self.logger.info(f"{scraper.target} last finished {int(elapsed)}s ago, next scrape in {int(wait_seconds)}s")
+        return time.monotonic() + max(0, wait_seconds)
+
+    def _run_target(self, scraper):
+        key = id(scraper)
+        try:
+            self.logger.info(f"Scraping {scraper.target}")
+            new_bookings = scraper.scrape_current_month()
+            self.idle_cycles[key] = 0 if new_bookings else self.idle_cycles[key] + 1
+            self.logger.info(f"Finished {scraper.target} with {new_bookings} new bookings, "
+                             f"last successful scrape at {scraper.last_scrape_date}")
+        except Exception as e:
+            self.logger.error(f"Error scraping {scraper.target}: {str(e)}")
+            self.logger.exception("Exception details:")
+        finally:
+            # The next cycle is timed from the end of this one
+            interval = self.cadences[key].next_interval(self.idle_cycles[key])
+            self.next_run[key] = time.monotonic() + interval
+            self.logger.info(f"Next scrape of {scraper.target} in {interval:.0f}s")
+
+    def run(self, exit_event):
+        self.logger.info(f"Starting scraping engine with {len(self.scrapers)} targets")
+        while not exit_event.is_set():
+            now = time.monotonic()
+            for scraper in self.scrapers:
+                key = id(scraper)
+                future = self.in_flight.get(key)
+                if future is not None and not future.done():
+                    continue
+                if now >= self.next_run[key]:
+                    self.in_flight[key] = self.target_executor.submit(self._run_target, scraper)
+            exit_event.wait(1)
+        self.stop()
+
+    def stop(self):
+        for scraper in self.scrapers:
+            scraper.stop()
+        self.article_executor.shutdown(wait=False, cancel_futures=True)
+        self.target_executor.shutdown(wait=True, cancel_futures=True)
+        self.upload_pool.shutdown()
+        self.batch_writer.flush()
+        self.logger.info("Scraping engine stopped")
@@ -1,8 +1,38 @@
+import json
+
+
 class ScrapingTarget:
-    def __init__(self, state: str, county: str, url: str):
+    def __init__(self, state: str, county: str, url: str, rate_limit: float = None, concurrency: int = None,
+                 extractor: str = "default", extraction: dict = None, timezone: str = None):
         self.state = state
         self.county = county
         self.url = url
+        self.rate_limit = rate_limit
+        self.concurrency = concurrency
+        self.extractor = extractor
+        self.extraction = extraction
+        self.timezone = timezone
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ScrapingTarget":
+        return cls(
+            state=data["state"],
+            county=data["county"],
+            url=data["url"],
+            rate_limit=data.get("rate_limit"),
+            concurrency=data.get("concurrency"),
+            extractor=data.get("extractor", "default"),
+            extraction=data.get("extraction"),
+            timezone=data.get("timezone"),
+        )
 
     def __str__(self):
-        return f"ScrapingTarget(state={self.state}, county={self.county}, url={self.url})"
\ No newline at end of file
+        return f"ScrapingTarget(state={self.state}, county={self.county}, url={self.url})"
+
+
+def load_targets(path: str = None, default: ScrapingTarget = None) -> list:
+    """Read targets from a JSON list of {state, county, url[, rate_limit, concurrency, extractor, extraction, timezone]} objects."""
+    if not path:
+        return [default] if default else []
+    with open(path) as f:
+        return [ScrapingTarget.from_dict(item) for item in json.load(f)]
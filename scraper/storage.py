@@ -0,0 +1,198 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import io
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend(ABC):
+    """Where cropped mugshots are stored. Implementations log failures and return "" from upload().
+
+    There is no batch existence check: image names are flat
+    (First_Last_MM-DD-YYYY.jpg), so a listing by prefix would page through
+    the whole bucket, and ImageIndex already skips the check for any image
+    uploaded before.
+    """
+
+    @abstractmethod
+    def upload(self, image_data: io.BytesIO, filename: str, content_type: str = "image/jpeg") -> str:
+        pass
+
+    @abstractmethod
+    def exists(self, filename: str) -> bool:
+        pass
+
+    @abstractmethod
+    def public_url(self, filename: str) -> str:
+        pass
+
+
+class SupabaseStorage(StorageBackend):
+    def __init__(self, url, key, bucket):
+        self.url = url
+        self.key = key
+        self.bucket = bucket
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def storage(self):
+        # The Supabase client is created on first use rather than at import time
+        with self._lock:
+            if self._client is None:
+                from supabase import create_client
+                self._client = create_client(self.url, self.key)
+        return self._client.storage.from_(self.bucket)
+
+    def public_url(self, filename: str) -> str:
+        return self.storage.get_public_url(filename)
+
+    def exists(self, filename: str) -> bool:
+        files = self.storage.list(path="", options={"search": filename})
+        return any(file['name'] == filename for file in files)
+
+    def upload(self, image_data: io.BytesIO, filename: str, content_type: str = "image/jpeg") -> str:
+        try:
+            logger.info(f"Checking if image already exists in Supabase: {filename}")
+
+            # Check if the file already exists
+            if self.exists(filename):
+                url = self.public_url(filename)
+                logger.info(f"Image already exists in Supabase: {url}")
+                return url
+
+            logger.info(f"Uploading new image to Supabase: {filename}")
+
+            # The Supabase client only takes bytes or a file path, so this copies the encoded image once
+            file_contents = image_data.getvalue()
+
+            # Upload the file to Supabase storage
+            result = self.storage.upload(
+                path=filename,
+                file=file_contents,
+                file_options={"content-type": content_type}
+            )
+
+            logger.info(f"Upload result: {result}")
+
+            # Check if the upload was successful
+            if hasattr(result, 'status_code') and result.status_code == 200:
+                # Generate the public URL for the uploaded file
+                url = self.public_url(filename)
+                logger.info(f"Successfully uploaded image to Supabase: {url}")
+                return url
+            elif isinstance(result, dict) and 'path' in result:
+                # If result is a dictionary with 'path', assume it's successful
+                url = self.public_url(result['path'])
+                logger.info(f"Successfully uploaded image to Supabase: {url}")
+                return url
+            else:
+                logger.error(f"Failed to upload. Unexpected result: {result}")
+                return ""
+
+        except Exception as e:
+            if "The resource already exists" in str(e):
+                logger.info(f"Image already exists in Supabase: {filename}")
+                return self.public_url(filename)
+            else:
+                logger.error(f"Failed to upload to Supabase: {str(e)}")
+                logger.exception("Exception details:")
+                return ""
+
+
+class S3Storage(StorageBackend):
+    """Any S3-compatible store (AWS S3, MinIO, R2, ...). Credentials come from the usual AWS_* variables."""
+
+    def __init__(self, bucket, endpoint_url=None, region=None, public_base_url=None):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.public_base_url = public_base_url
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                import boto3
+                self._client = boto3.client("s3", endpoint_url=self.endpoint_url, region_name=self.region)
+        return self._client
+
+    def public_url(self, filename: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url.rstrip('/')}/{filename}"
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{filename}"
+        return f"https://{self.bucket}.s3.amazonaws.com/{filename}"
+
+    def exists(self, filename: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=filename)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey", "NotFound"):
+                raise
+            return False
+
+    def upload(self, image_data: io.BytesIO, filename: str, content_type: str = "image/jpeg") -> str:
+        try:
+            image_data.seek(0)
+            # upload_fileobj streams the buffer and switches to multipart for large files
+            self.client.upload_fileobj(image_data, self.bucket, filename, ExtraArgs={"ContentType": content_type})
+            url = self.public_url(filename)
+            logger.info(f"Successfully uploaded image to S3: {url}")
+            return url
+        except Exception as e:
+            logger.error(f"Failed to upload to S3: {str(e)}")
+            logger.exception("Exception details:")
+            return ""
+
+
+class LocalStorage(StorageBackend):
+    """Writes images into a directory, e.g. one served by a CDN or nginx, or a temp dir in tests."""
+
+    def __init__(self, root_dir, public_base_url=None):
+        self.root_dir = root_dir
+        self.public_base_url = public_base_url
+        os.makedirs(root_dir, exist_ok=True)
+
+    def public_url(self, filename: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url.rstrip('/')}/{filename}"
+        return f"file://{os.path.abspath(os.path.join(self.root_dir, filename))}"
+
+    def exists(self, filename: str) -> bool:
+        return os.path.exists(os.path.join(self.root_dir, filename))
+
+    def upload(self, image_data: io.BytesIO, filename: str, content_type: str = "image/jpeg") -> str:
+        try:
+            image_data.seek(0)
+            # Write to a temp file first so readers never see a partial image
+            fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(image_data, f)
+            os.replace(tmp_path, os.path.join(self.root_dir, filename))
+            return self.public_url(filename)
+        except Exception as e:
+            logger.error(f"Failed to write image to {self.root_dir}: {str(e)}")
+            logger.exception("Exception details:")
+            return ""
+
+
+def get_storage() -> StorageBackend:
+    """Build the backend selected by STORAGE_BACKEND."""
+    import config
+    backend = config.STORAGE_BACKEND
+    if backend == "supabase":
+        return SupabaseStorage(config.SUPABASE_URL, config.SUPABASE_KEY, config.SUPABASE_BUCKET_NAME)
+    if backend == "s3":
+        return S3Storage(config.S3_BUCKET, config.S3_ENDPOINT_URL, config.S3_REGION, config.S3_PUBLIC_URL)
+    if backend == "local":
+        return LocalStorage(config.LOCAL_STORAGE_DIR, config.LOCAL_STORAGE_BASE_URL)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
@@ -0,0 +1,88 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from utils.metrics import UPLOAD_SECONDS, QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+class UploadPool:
+    """Uploads images on a bounded worker pool so slow storage does not stall scraping.
+
+    submit() blocks once max_pending uploads are queued or running, which
+    slows the scraper down instead of buffering images without limit. Failed
+    uploads are retried with exponential backoff and full jitter. on_success
+    is called with the public URL once an upload completes, and on_failure
+    after the last attempt fails.
+    """
+
+    def __init__(self, upload_fn, workers=4, max_pending=16, max_retries=4, base_delay=1.0, max_delay=30.0):
+        self.upload_fn = upload_fn
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.futures = set()
+        self.lock = threading.Lock()
+
+    def _upload_with_retries(self, image_data, filename, content_type):
+        for attempt in range(self.max_retries):
+            try:
+                started_at = time.perf_counter()
+                url = self.upload_fn(image_data, filename, content_type)
+                UPLOAD_SECONDS.observe(time.perf_counter() - started_at, outcome="ok" if url else "failed")
+                if url:
+                    return url
+            except Exception as e:
+                logger.warning(f"Upload of {filename} raised on attempt {attempt + 1}: {e}")
+            if attempt < self.max_retries - 1:
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                logger.warning(f"Upload of {filename} failed (attempt {attempt + 1}). Retrying in {delay:.1f}s")
+                time.sleep(delay)
+        return ""
+
+    def _run(self, image_data, filename, content_type, on_success, on_failure):
+        try:
+            url = self._upload_with_retries(image_data, filename, content_type)
+            if url:
+                on_success(url)
+            else:
+                logger.error(f"Giving up on upload of {filename} after {self.max_retries} attempts")
+                on_failure()
+        except Exception as e:
+            logger.error(f"Error finishing upload of {filename}: {e}")
+            logger.exception("Exception details:")
+        finally:
+            self.slots.release()
+
+    def submit(self, image_data, filename, content_type, on_success, on_failure):
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(self._run, image_data, filename, content_type, on_success, on_failure)
+        except RuntimeError:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.futures.add(future)
+            QUEUE_DEPTH.set(len(self.futures), queue="uploads")
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future):
+        with self.lock:
+            self.futures.discard(future)
+            QUEUE_DEPTH.set(len(self.futures), queue="uploads")
+
+    def drain(self):
+        """Wait for every upload submitted so far."""
+        with self.lock:
+            pending = list(self.futures)
+        if pending:
+            logger.info(f"Waiting for {len(pending)} uploads to finish")
+            wait(pending)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -1,144 +1,321 @@
 import time
 import random
-import requests
-from requests.exceptions import RequestException
+import httpx
 from fake_useragent import UserAgent
 import logging
-from bs4 import BeautifulSoup
 import io
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from scraper.database import DatabaseManager
+from scraper.database import MugshotBatchWriter
 from scraper.s3_uploader import SupabaseUploader
+from scraper.storage import get_storage
 from utils.image_processor import ImageProcessor
-from config import BASE_URL, STATE, COUNTY
+from scraper.rate_limiter import HostRateLimiter
+from scraper.dedup_index import DedupIndex
+from scraper.scraping_target import ScrapingTarget
+from scraper.cadence import ScrapeCadence
+from scraper.crawl_state import CrawlState
+from scraper.http_cache import HttpCache
+from scraper.image_index import ImageIndex
+from scraper.upload_pool import UploadPool
+from scraper.html_parser import parse_listing, parse_article
+from scraper.extractor import ContentExtractor, get_rules
+from utils.http_client import get_client, ACCEPT_ENCODING
+from utils.metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS, PARSE_SECONDS, CROP_SECONDS, RECORDS
+from config import BASE_URL, STATE, COUNTY, SCRAPER_MODE, SCRAPER_CONCURRENCY, SCRAPER_RATE_LIMIT, SCRAPER_BURST, DEDUP_WINDOW_DAYS, DB_BATCH_SIZE, DB_BATCH_FLUSH_SECONDS, HTTP_CACHE_FILE, HTTP_CACHE_MAX_AGE
+from config import IMAGE_FORMAT, IMAGE_QUALITY, IMAGE_MAX_DIMENSION, IMAGE_INDEX_FILE, PHASH_MAX_DISTANCE
+from config import UPLOAD_WORKERS, UPLOAD_MAX_PENDING, UPLOAD_MAX_RETRIES, SCRAPER_MAX_RATE_LIMIT, CRAWL_STATE_FILE
 
 class WebsiteScraper:
-    def __init__(self, logger):
+    def __init__(self, logger, target=None, executor=None, batch_writer=None, http_cache=None,
+                 image_index=None, upload_pool=None, fb_status="pending", crawl_state=None):
         self.logger = logger
+        self.target = target or ScrapingTarget(STATE, COUNTY, BASE_URL)
         self.user_agent = UserAgent()
-        self.session = self._create_session()
-        self.base_url = BASE_URL
-        self.state = STATE
-        self.county = COUNTY
+        self.headers = self._create_headers()
+        self.base_url = self.target.url.rstrip('/')
+        self.state = self.target.state
+        self.county = self.target.county
         self.running = True
         self.last_scrape_date = None
+        self.new_bookings = 0
+        # Status given to new records; anything other than "pending" is never posted
+        self.fb_status = fb_status
         self.request_count = 0
         self.session_start_time = time.time()
+        self.mode = SCRAPER_MODE
+        self.session_lock = threading.RLock()
+        self.rate_limiter = HostRateLimiter(
+            self.target.rate_limit or SCRAPER_RATE_LIMIT,
+            SCRAPER_BURST,
+            self.target.concurrency or SCRAPER_CONCURRENCY,
+            max_rate=max(SCRAPER_MAX_RATE_LIMIT, self.target.rate_limit or SCRAPER_RATE_LIMIT)
+        )
+        self.owns_executor = executor is None and self.mode == "concurrent"
+        if self.owns_executor:
+            executor = ThreadPoolExecutor(max_workers=self.target.concurrency or SCRAPER_CONCURRENCY)
+        self.executor = executor if self.mode == "concurrent" else None
+        self.dedup_index = DedupIndex(self.state, self.county, DEDUP_WINDOW_DAYS)
+        self.batch_writer = batch_writer or MugshotBatchWriter(DB_BATCH_SIZE, DB_BATCH_FLUSH_SECONDS)
+        self.http_cache = http_cache or HttpCache(HTTP_CACHE_FILE, HTTP_CACHE_MAX_AGE)
+        self.image_index = image_index or ImageIndex(IMAGE_INDEX_FILE, PHASH_MAX_DISTANCE)
+        self.owns_upload_pool = upload_pool is None
+        self.upload_pool = upload_pool or UploadPool(
+            get_storage().upload, UPLOAD_WORKERS, UPLOAD_MAX_PENDING, UPLOAD_MAX_RETRIES
+        )
+        self.extractor = ContentExtractor(get_rules(self.target.extractor, self.target.extraction))
+        self.crawl_state = crawl_state or CrawlState(CRAWL_STATE_FILE)
+        self.state_key = CrawlState.key(self.target)
+        self.cycle_failed = False
+        self.cycle_pages = []
+        self.cycle_top = None
+        last_success = self.crawl_state.get(self.state_key).get("last_success")
+        if last_success:
+            self.last_scrape_date = datetime.fromisoformat(last_success)
 
-    def _create_session(self):
-        session = requests.Session()
-        session.headers.update({
+    def _create_headers(self):
+        return {
             'User-Agent': self.user_agent.random,
             'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-        })
-        return session
+            'Accept-Encoding': ACCEPT_ENCODING,
+        }
 
     def _rotate_session(self):
-        self.session = self._create_session()
-        self.request_count = 0
-        self.session_start_time = time.time()
-        self.logger.info("Rotated to a new session with a new User-Agent.")
+        # Only the headers change; pooled connections in the shared client stay open
+        with self.session_lock:
+            self.headers = self._create_headers()
+            self.request_count = 0
+            self.session_start_time = time.time()
+        self.logger.info("Rotated to a new User-Agent.")
 
-    def _make_request(self, url, max_retries=3):
+    def _make_request(self, url, max_retries=3, use_cache=False, url_class="page"):
+        """GET url with retries. With use_cache, returns None when the page is unchanged since the last fetch."""
+        cache_headers = self.http_cache.conditional_headers(url) if use_cache else {}
+        # Images come from a different host than pages, so they get their own pool
+        client = get_client("images" if url_class == "image" else "pages")
         for attempt in range(max_retries):
             try:
-                if self.request_count >= 100 or time.time() - self.session_start_time > 3600:
-                    self._rotate_session()
-                
-                response = self.session.get(url, timeout=30)
-                response.raise_for_status()
+                with self.session_lock:
+                    if self.request_count >= 100 or time.time() - self.session_start_time > 3600:
+                        self._rotate_session()
+                    headers = {**self.headers, **cache_headers}
+
+                try:
+                    if self.mode == "serial":
+                        with HTTP_REQUEST_SECONDS.time(url_class=url_class):
+                            response = client.get(url, headers=headers)
+                    else:
+                        # The adaptive token bucket paces requests per host instead of sleeping after each one
+                        with self.rate_limiter.limit(url), HTTP_REQUEST_SECONDS.time(url_class=url_class):
+                            response = client.get(url, headers=headers)
+                except httpx.HTTPError:
+                    HTTP_REQUESTS.inc(url_class=url_class, status="error")
+                    self.rate_limiter.feedback(url)
+                    raise
+                HTTP_REQUESTS.inc(url_class=url_class, status=f"{response.status_code // 100}xx")
+                self.rate_limiter.feedback(url, response.status_code, response.headers.get("Retry-After"))
+                # httpx treats 304 as an error; it is how the HTTP cache learns a page is unchanged
+                if response.status_code != 304:
+                    response.raise_for_status()
                 
-                self.request_count += 1
+                with self.session_lock:
+                    self.request_count += 1
                 
-                wait_time = random.uniform(2, 5) * (2 ** attempt)
-                time.sleep(wait_time)
+                if self.mode == "serial":
+                    wait_time = random.uniform(2, 5) * (2 ** attempt)
+                    time.sleep(wait_time)
                 
+                if use_cache and self.http_cache.is_unchanged(url, response):
+                    return None
                 return response
-            except RequestException as e:
+            except httpx.HTTPError as e:
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 404:
+                    # Missing pages (e.g. past the last archive page) won't appear on retry
+                    raise
                 self.logger.warning(f"Request failed (attempt {attempt + 1}): {str(e)}")
                 if attempt == max_retries - 1:
-                    self.logger.error(f"Failed to access {url} after {max_retries} attempts. Rotating session...")
+                    self.logger.error(f"Failed to access {url} after {max_retries} attempts. Rotating User-Agent...")
                     self._rotate_session()
-                    time.sleep(random.uniform(60, 120))
+                    if self.mode == "serial":
+                        time.sleep(random.uniform(60, 120))
                     raise
-                time.sleep(random.uniform(10, 20))
+                if self.mode == "serial":
+                    time.sleep(random.uniform(10, 20))
+                else:
+                    # The limiter has already slowed this host down (and honours Retry-After);
+                    # a little jitter keeps parallel retries from lining up
+                    time.sleep(random.uniform(0, 2 ** attempt))
 
     def scrape(self):
+        """Scrape this target on its own, following the same cadence as ScrapingEngine."""
+        cadence = ScrapeCadence.from_config(self.target.timezone)
+        idle_cycles = 0
         while self.running:
             try:
-                self.scrape_current_month()
-                self.logger.info("Sleeping for 5 minutes before next scrape...")
-                for _ in range(30):
-                    if not self.running:
-                        break
-                    time.sleep(10)
+                new_bookings = self.scrape_current_month()
+                idle_cycles = 0 if new_bookings else idle_cycles + 1
             except Exception as e:
                 self.logger.error(f"Error in main scraping loop: {str(e)}")
                 self.logger.exception("Exception details:")
-                time.sleep(60)
+            interval = cadence.next_interval(idle_cycles)
+            self.logger.info(f"Sleeping for {interval:.0f}s before next scrape...")
+            deadline = time.monotonic() + interval
+            while self.running and time.monotonic() < deadline:
+                time.sleep(min(1, deadline - time.monotonic()))
 
     def scrape_current_month(self):
         current_date = datetime.now().date()
         current_year, current_month = current_date.year, current_date.month
         url = f"{self.base_url}/{current_year}/{current_month:02d}/"
+        futures = []
+        self.new_bookings = 0
+        self.dedup_index.refresh(current_date)
+
+        saved = self.crawl_state.get(self.state_key)
+        month = f"{current_year}-{current_month:02d}"
+        if saved.get("month") != month:
+            saved = {}
+            self.crawl_state.update(self.state_key, month=month, newest_url=None, last_page=0, in_progress=False,
+                                    cycle_top=None)
+        # An interrupted cycle must get past the pages it had reached before the "nothing new" rule applies
+        resume_page = saved.get("last_page", 0) if saved.get("in_progress") else 0
+        if resume_page:
+            self.logger.info(f"Resuming interrupted cycle for {self.target}, last reached page {resume_page}")
+        self.cycle_top = saved.get("cycle_top") if saved.get("in_progress") else None
+        self.cycle_failed = False
+        self.cycle_pages = []
+        self.crawl_state.update(self.state_key, in_progress=True)
+
+        completed = False
+        try:
+            self._scrape_listing_pages(url, current_date, futures, saved.get("newest_url"), resume_page)
+            completed = True
+        finally:
+            if futures:
+                self.logger.info(f"Waiting for {len(futures)} article fetches to finish")
+                wait(futures)
+            self.upload_pool.drain()
+            self.batch_writer.flush()
+            self.logger.info(f"HTTP cache stats: {self.http_cache.stats()}")
+
+        if completed and self.running and not self.cycle_failed and not self.batch_writer.unsaved(self.state_key):
+            self.http_cache.commit(self.cycle_pages)
+            self.last_scrape_date = datetime.now()
+            # Everything down to cycle_top is stored, so the next cycle can stop there
+            self.crawl_state.update(self.state_key, newest_url=self.cycle_top or saved.get("newest_url"),
+                                    cycle_top=None, last_page=0, in_progress=False,
+                                    last_success=self.last_scrape_date.isoformat())
+        else:
+            # A cached page would read as unchanged and hide the bookings that failed on it
+            self.http_cache.forget(self.cycle_pages)
+            self.logger.warning(f"Cycle for {self.target} did not finish cleanly; the next one rescans it")
+        return self.new_bookings
+
+    def _submit_article(self, link, futures, on_failed=None):
+        self.new_bookings += 1
+        if self.executor is None:
+            self.process_article(link, on_failed)
+        else:
+            futures.append(self.executor.submit(self.process_article, link, on_failed))
+
+    def _mark_failed(self, on_failed):
+        self.cycle_failed = True
+        if on_failed:
+            on_failed()
+
+    def _scrape_listing_pages(self, url, current_date, futures, newest_seen=None, resume_page=0):
         page = 1
 
         while self.running:
             try:
                 page_url = url if page == 1 else f"{url}page/{page}/"
                 self.logger.info(f"Scraping {page_url}")
-                response = self._make_request(page_url)
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                articles = soup.find_all('h2', class_='entry-title')
-                if not articles:
+                try:
+                    # Pages an interrupted cycle already reached may hide failed articles, so they are always re-parsed
+                    response = self._make_request(page_url, use_cache=page > resume_page, url_class="listing")
+                except httpx.HTTPStatusError as e:
+                    if page > 1 and e.response.status_code == 404:
+                        self.logger.info(f"{page_url} not found, no more pages. Ending scrape.")
+                        break
+                    raise
+                if response is None:
+                    self.logger.info(f"{page_url} unchanged since last scrape. Stopping scrape.")
+                    break
+                self.cycle_pages.append(page_url)
+                entries = self.listing_entries(response.content)
+                if not entries:
                     self.logger.info("No more articles found. Ending scrape.")
                     break
+                if self.cycle_top is None:
+                    self.cycle_top = entries[0][0]
+                    self.crawl_state.update(self.state_key, cycle_top=self.cycle_top)
                 
-                self.logger.info(f"Found {len(articles)} articles on page {page}")
+                self.logger.info(f"Found {len(entries)} articles on page {page}")
                 
                 new_mugshots_found = False
-                for article in articles:
+                for link, firstName, lastName, booking_date in entries:
                     if not self.running:
                         break
+
+                    if link == newest_seen:
+                        self.logger.info("Reached the newest article from the last cycle. Stopping scrape.")
+                        return
+
+                    if booking_date > current_date:
+                        self.logger.warning(f"Found future date {booking_date}, skipping")
+                        continue
                     
-                    link = article.find('a')['href']
-                    article_text = article.get_text(strip=True)
-                    try:
-                        name_parts = article_text.split()
-                        date_str = name_parts[-1]
-                        firstName = name_parts[0].replace("'", "")
-                        lastName = " ".join(name_parts[1:-1]).replace("'", "")
-                        booking_date = datetime.strptime(date_str, "%m/%d/%Y").date()
-
-                        if booking_date > current_date:
-                            self.logger.warning(f"Found future date {booking_date}, skipping")
-                            continue
-                        
-                        if booking_date < current_date:
-                            self.logger.info(f"Found mugshot from {booking_date}, stopping scrape.")
-                            return
-
-                        if not DatabaseManager.is_in_database(firstName, lastName, booking_date):
-                            self.process_article(link)
-                            new_mugshots_found = True
-                        else:
-                            self.logger.info(f"Mugshot already in database: {firstName} {lastName}")
-                    except Exception as e:
-                        self.logger.error(f"Error processing article title: {article_text} - {str(e)}")
-                        continue                
-                if not new_mugshots_found:
+                    if booking_date < current_date:
+                        self.logger.info(f"Found mugshot from {booking_date}, stopping scrape.")
+                        return
+
+                    if self.submit_if_new(link, firstName, lastName, booking_date, futures):
+                        new_mugshots_found = True
+                self.crawl_state.update(self.state_key, last_page=max(page, resume_page))
+                if not new_mugshots_found and page > resume_page:
                     self.logger.info("No new mugshots found on this page. Stopping scrape.")
                     return
                 
                 page += 1
             except Exception as e:
+                self.cycle_failed = True
                 self.logger.error(f"Error scraping {page_url}: {str(e)}")
                 self.logger.exception("Exception details:")
                 break
 
+    def listing_entries(self, content):
+        """Parse a listing page into (link, firstName, lastName, booking_date) tuples, skipping bad titles."""
+        with PARSE_SECONDS.time(page="listing"):
+            soup = parse_listing(content)
+        entries = []
+        for article in soup.find_all('h2', class_='entry-title'):
+            article_text = article.get_text(strip=True)
+            try:
+                link = article.find('a')['href']
+                name_parts = article_text.split()
+                date_str = name_parts[-1]
+                firstName = name_parts[0].replace("'", "")
+                lastName = " ".join(name_parts[1:-1]).replace("'", "")
+                booking_date = datetime.strptime(date_str, "%m/%d/%Y").date()
+                entries.append((link, firstName, lastName, booking_date))
+            except Exception as e:
+                self.logger.error(f"Error processing article title: {article_text} - {str(e)}")
+        return entries
+
+    def submit_if_new(self, link, firstName, lastName, booking_date, futures, on_failed=None):
+        """Queue the article unless the booking is already stored. Returns whether it was queued.
+
+        on_failed is called if the article, its image or its upload fails.
+        """
+        if self.dedup_index.contains(firstName, lastName, booking_date):
+            RECORDS.inc(stage="deduped")
+            self.logger.info(f"Mugshot already in database: {firstName} {lastName}")
+            return False
+        RECORDS.inc(stage="scraped")
+        self._submit_article(link, futures, on_failed)
+        return True
+
     def get_booking_date(self, title):
         try:
             date_str = title.split()[-1]
@@ -147,65 +324,97 @@ class WebsiteScraper:
             self.logger.error(f"Could not parse date from title: {title}")
             return datetime.now().date()
 
-    def process_article(self, url):
+    def process_article(self, url, on_failed=None):
         try:
-            response = self._make_request(url)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            title = soup.find('h1').text.strip()
-            name_parts = title.split()
-            date_str = name_parts[-1]
-            firstName = name_parts[0]
-            lastName = " ".join(name_parts[1:-1])
-            booking_date = datetime.strptime(date_str, "%m/%d/%Y").date()
-            
-            self.scrape_mugshot(url, soup, firstName, lastName, booking_date, date_str)
+            response = self._make_request(url, url_class="article")
+            with PARSE_SECONDS.time(page="article"):
+                soup = parse_article(response.content, self.extractor.rules.strainer)
+                record = self.extractor.extract(soup)
+            self.scrape_mugshot(url, record, on_failed)
         except Exception as e:
+            self._mark_failed(on_failed)
             self.logger.error(f"Error processing article {url}: {str(e)}")
             self.logger.exception("Exception details:")
 
-    def scrape_mugshot(self, url, soup, firstName, lastName, booking_date, date_str):
+    def scrape_mugshot(self, url, record, on_failed=None):
+        firstName, lastName = record["firstName"], record["lastName"]
+        booking_date, date_str = record["dateOfBooking"], record["date_str"]
         try:
-            img_tag = soup.find('img', class_='attachment-full')
-            image_url = img_tag['src'] if img_tag and 'src' in img_tag.attrs else None
-            
-            details_div = soup.find('div', class_='entry-content')
-            details_html = details_div.prettify() if details_div else ""
-            
-            offense_description, additional_details = DatabaseManager.parse_content(details_html)
+            image_url = record["image_url"]
+            offense_description = record["offense_description"]
+            additional_details = record["additional_details"]
             
             if image_url:
-                image_response = self._make_request(image_url)
+                image_response = self._make_request(image_url, url_class="image")
                 image_data = image_response.content
                 
                 image_file = io.BytesIO(image_data)
-                cropped_image = ImageProcessor.crop_image(image_file)
-                
-                filename = SupabaseUploader.generate_filename(firstName, lastName, date_str)
-                supabase_url = SupabaseUploader.upload_to_supabase(cropped_image, filename)
+                with CROP_SECONDS.time(format=IMAGE_FORMAT):
+                    cropped_image, content_hash, phash = ImageProcessor.process_image(
+                        image_file,
+                        image_format=IMAGE_FORMAT,
+                        quality=IMAGE_QUALITY,
+                        max_dimension=IMAGE_MAX_DIMENSION
+                    )
                 
+                filename = SupabaseUploader.generate_filename(
+                    firstName, lastName, date_str, ImageProcessor.file_extension(IMAGE_FORMAT)
+                )
+                mugshot_data = {
+                    "firstName": firstName,
+                    "lastName": lastName,
+                    "dateOfBooking": booking_date,
+                    "stateOfBooking": self.state,
+                    "countyOfBooking": self.county,
+                    "offenseDescription": offense_description,
+                    "additionalDetails": additional_details, 
+                    "fb_status": self.fb_status
+                }
+
+                supabase_url = self.image_index.lookup(content_hash)
                 if supabase_url:
-                    mugshot_data = {
-                        "firstName": firstName,
-                        "lastName": lastName,
-                        "dateOfBooking": booking_date,
-                        "stateOfBooking": self.state,
-                        "countyOfBooking": self.county,
-                        "offenseDescription": offense_description,
-                        "additionalDetails": additional_details, 
-                        "imagePath": supabase_url,
-                        "fb_status": "pending"
-                    }
-                    DatabaseManager.insert_mugshot(mugshot_data)
-                    self.logger.info(f"Successfully processed: {firstName} {lastName} {booking_date}")
-                else:
+                    RECORDS.inc(stage="image_reused")
+                    self.logger.info(f"Image already uploaded, reusing {supabase_url}")
+                    self._store_mugshot(mugshot_data, supabase_url)
+                    return
+
+                similar = self.image_index.find_similar(phash)
+                if similar:
+                    self.logger.warning(f"Possible duplicate booking: {filename} looks like {', '.join(similar)}")
+
+                def on_uploaded(uploaded_url):
+                    self.image_index.add(content_hash, phash, filename, uploaded_url)
+                    self._store_mugshot(mugshot_data, uploaded_url)
+
+                def on_upload_failed():
+                    # Let the next cycle pick this booking up again
+                    self._mark_failed(on_failed)
+                    self.dedup_index.discard(firstName, lastName, booking_date)
                     self.logger.warning(f"Failed to upload image for: {firstName} {lastName}")
+
+                # Mark the booking as seen now so it is not queued twice while the upload runs
+                self.dedup_index.add(firstName, lastName, booking_date)
+                self.upload_pool.submit(
+                    cropped_image, filename, ImageProcessor.content_type(IMAGE_FORMAT), on_uploaded, on_upload_failed
+                )
             else:
                 self.logger.warning(f"No image found for: {firstName} {lastName}")
         except Exception as e:
+            self._mark_failed(on_failed)
             self.logger.error(f"Error processing mugshot from {url}: {str(e)}")
             self.logger.exception("Exception details:")
 
+    def _store_mugshot(self, mugshot_data, image_url):
+        mugshot_data["imagePath"] = image_url
+        self.batch_writer.add(mugshot_data, owner=self.state_key)
+        RECORDS.inc(stage="stored")
+        self.dedup_index.add(mugshot_data["firstName"], mugshot_data["lastName"], mugshot_data["dateOfBooking"])
+        self.logger.info(f"Successfully processed: {mugshot_data['firstName']} {mugshot_data['lastName']} {mugshot_data['dateOfBooking']}")
+
     def stop(self):
         self.running = False
+        if self.owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.owns_upload_pool:
+            self.upload_pool.shutdown()
         self.logger.info("Stopping scraper...")
\ No newline at end of file
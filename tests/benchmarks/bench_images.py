@@ -0,0 +1,64 @@
+"""CPU time and peak RSS per image for ImageProcessor.process_image, by output format and decode size.
+
+    python -m tests.benchmarks.bench_images [--images 30] [--size 1200x1500]
+
+Every variant runs in a fresh process so its peak RSS is its own; "idle"
+is that process's RSS after loading the input, before any image is
+processed. The input is a photo-like JPEG of --size pixels; max_dimension
+600 lets the JPEG decoder work at half scale on the default size.
+"""
+import argparse
+import io
+import multiprocessing
+import random
+import resource
+import time
+
+VARIANTS = [
+    ("JPEG", 0),
+    ("JPEG", 600),
+    ("WEBP", 0),
+    ("WEBP", 600),
+]
+
+
+def make_photo(width, height):
+    from PIL import Image, ImageFilter
+    # Smoothed noise compresses and decodes like a photo, unlike flat colour or raw noise
+    noise = Image.frombytes("RGB", (width // 8, height // 8), random.Random(0).randbytes(width * height * 3 // 64))
+    image = noise.resize((width, height), Image.BICUBIC).filter(ImageFilter.GaussianBlur(2))
+    data = io.BytesIO()
+    image.save(data, format="JPEG", quality=90)
+    return data.getvalue()
+
+
+def run(image_format, max_dimension, jpeg, images, results):
+    from utils.image_processor import ImageProcessor
+    idle = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.process_time()
+    for _ in range(images):
+        output, _, _ = ImageProcessor.process_image(io.BytesIO(jpeg), image_format=image_format,
+                                                    max_dimension=max_dimension)
+    cpu = (time.process_time() - started) / images
+    results.put((cpu, idle, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, output.getbuffer().nbytes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=30)
+    parser.add_argument("--size", default="1200x1500", help="input width x height")
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.split("x"))
+    jpeg = make_photo(width, height)
+    print(f"input {width}x{height}, {len(jpeg) // 1024} KiB")
+    context = multiprocessing.get_context("spawn")
+    for image_format, max_dimension in VARIANTS:
+        results = context.Queue()
+        process = context.Process(target=run, args=(image_format, max_dimension, jpeg, args.images, results))
+        process.start()
+        cpu, idle, peak, size = results.get()
+        process.join()
+        # ru_maxrss is in KiB on Linux
+        print(f"{image_format:<5} max_dimension={max_dimension:<5} {cpu * 1000:.1f} ms CPU/image, "
+              f"peak RSS {peak / 1024:.0f} MiB (idle {idle / 1024:.0f} MiB), output {size // 1024} KiB")
@@ -0,0 +1,74 @@
+"""Per-page parse time and memory for the saved article fixtures, full document vs strained.
+
+    python -m tests.benchmarks.bench_parsing [--rounds 200] [--chrome 40]
+
+The fixtures only hold the article itself, so each one gets --chrome KB
+of WordPress-style menu, widget and script markup in its header and again
+in a sidebar, which is what most of a real page is. Memory is the
+tracemalloc peak while parsing one page and extracting its record.
+"""
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+from bs4 import BeautifulSoup
+from scraper.extractor import ContentExtractor
+from scraper.html_parser import ARTICLE_STRAINER, PARSER
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fixtures", "articles")
+
+CHROME_BLOCK = (
+    '<li class="menu-item"><a href="https://smithtx.mugshots.zone/category/smith-county/">Smith County</a>'
+    '<ul class="sub-menu"><li><a href="/2024/03/">March 2024</a></li><li><a href="/2024/02/">February 2024</a></li>'
+    '</ul></li><div class="widget"><h3 class="widget-title">Recent</h3><ul><li><a href="/x/">JANE ROE 03/13/2024</a>'
+    '</li></ul></div><script>window.dataLayer=window.dataLayer||[];function gtag(){dataLayer.push(arguments)}</script>'
+)
+
+
+def with_chrome(html, kilobytes):
+    chrome = CHROME_BLOCK * max(1, kilobytes * 1024 // len(CHROME_BLOCK))
+    head, _, rest = html.partition(b"<body>")
+    if not rest:
+        return html
+    return head + b"<body><header><nav><ul>" + chrome.encode() + b"</ul></nav></header>" + rest.replace(
+        b"</body>", b"<aside>" + chrome.encode() + b"</aside></body>")
+
+
+def measure(pages, parse, rounds):
+    extractor = ContentExtractor()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for html in pages:
+            extractor.extract(parse(html))
+    per_page = (time.perf_counter() - started) / (rounds * len(pages))
+
+    peaks = []
+    for html in pages:
+        tracemalloc.start()
+        extractor.extract(parse(html))
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return per_page, max(peaks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--chrome", type=int, default=40, help="KB of page chrome around each article")
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        with open(path, "rb") as f:
+            pages.append(with_chrome(f.read(), args.chrome))
+    print(f"{len(pages)} pages, {sum(map(len, pages)) // len(pages) // 1024} KB on average, parser {PARSER}")
+
+    variants = {
+        "full, html.parser": lambda html: BeautifulSoup(html, "html.parser"),
+        f"full, {PARSER}": lambda html: BeautifulSoup(html, PARSER),
+        f"strained, {PARSER}": lambda html: BeautifulSoup(html, PARSER, parse_only=ARTICLE_STRAINER),
+    }
+    for name, parse in variants.items():
+        per_page, peak = measure(pages, parse, args.rounds)
+        print(f"{name:<22} {per_page * 1000:.2f} ms/page, peak {peak / 1024:.0f} KiB")
@@ -0,0 +1,119 @@
+"""Query plans and timings for the hot mugshots queries on a seeded table, with and without the model's indexes.
+
+    python -m tests.benchmarks.bench_queries [--rows 200000] [--url postgresql://.../scratch]
+
+Without --url the benchmark uses a temporary SQLite file. A --url database
+must be a scratch one: the benchmark refuses to run if it already has a
+mugshots table, and drops the tables it created when done. The same rows
+go into "mugshots", created from the model, and "mugshots_plain", a copy
+with no indexes or unique constraint, which is what the table looked like
+before the migration.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from sqlalchemy import MetaData, UniqueConstraint, create_engine, inspect, select, text
+from scraper.database import Mugshot
+
+STATES = {"Texas": ["Smith", "Gregg", "Harris", "Travis", "Bexar", "Dallas", "Tarrant"],
+          "Oklahoma": ["Comanche", "Tulsa", "Cleveland", "Canadian", "Payne", "Osage"],
+          "Arkansas": ["Pulaski", "Benton", "Washington", "Sebastian", "Faulkner", "Saline", "Craighead"]}
+
+
+def plain_copy(table):
+    plain = table.to_metadata(MetaData(), name="mugshots_plain")
+    plain.indexes.clear()
+    for constraint in [c for c in plain.constraints if isinstance(c, UniqueConstraint)]:
+        plain.constraints.discard(constraint)
+    return plain
+
+
+def seed(conn, tables, rows, today):
+    counties = [(state, county) for state, names in STATES.items() for county in names]
+    rng = random.Random(0)
+    batch = []
+    for n in range(rows):
+        state, county = counties[n % len(counties)]
+        booking_date = today - timedelta(days=rng.randrange(3 * 365))
+        batch.append({
+            "firstName": f"First{rng.randrange(5000)}", "lastName": f"Last{n}", "dateOfBooking": booking_date,
+            "stateOfBooking": state, "countyOfBooking": county, "offenseDescription": "- PUBLIC INTOXICATION",
+            "additionalDetails": "Age: 34", "imagePath": f"https://cdn.example.com/{n}.jpg",
+            "fb_status": "pending" if booking_date == today or rng.random() < 0.01 else "posted",
+        })
+        if len(batch) == 5000 or n == rows - 1:
+            for table in tables:
+                conn.execute(table.insert(), batch)
+            batch = []
+
+
+def queries(table, today):
+    c = table.c
+    return {
+        "dedup lookup": select(c.id).where(c.firstName == "First42", c.lastName == "Last4242",
+                                           c.dateOfBooking == today - timedelta(days=10)),
+        "today's pending": select(c.id).where(c.dateOfBooking == today, c.fb_status == "pending"),
+        "county window": select(c.firstName, c.lastName, c.dateOfBooking).where(
+            c.stateOfBooking == "Texas", c.countyOfBooking == "Smith", c.dateOfBooking >= today - timedelta(days=7)),
+    }
+
+
+def explain(conn, query):
+    sql = str(query.compile(conn, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN" if conn.dialect.name == "sqlite" else "EXPLAIN"
+    rows = conn.execute(text(f"{prefix} {sql}")).fetchall()
+    return "; ".join(str(row[-1]) for row in rows)
+
+
+def timed(conn, query, repeat):
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(query).fetchall()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--url", help="scratch database; a temporary SQLite file when omitted")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(args.url or f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        if inspect(engine).has_table("mugshots"):
+            parser.error("the database already has a mugshots table; point --url at a scratch database")
+        indexed = Mugshot.__table__
+        plain = plain_copy(indexed)
+        today = date.today()
+        try:
+            with engine.begin() as conn:
+                indexed.create(conn)
+                plain.create(conn)
+                started = time.perf_counter()
+                seed(conn, [indexed, plain], args.rows, today)
+                print(f"seeded {args.rows} rows into both tables in {time.perf_counter() - started:.1f}s "
+                      f"({engine.dialect.name})")
+            with engine.connect() as conn:
+                if engine.dialect.name == "postgresql":
+                    conn.execute(text("ANALYZE mugshots"))
+                    conn.execute(text("ANALYZE mugshots_plain"))
+                for (name, indexed_query), plain_query in zip(queries(indexed, today).items(),
+                                                              queries(plain, today).values()):
+                    with_index = timed(conn, indexed_query, args.repeat)
+                    without_index = timed(conn, plain_query, args.repeat)
+                    print(f"{name}: {with_index * 1000:.2f} ms indexed, {without_index * 1000:.2f} ms plain "
+                          f"({without_index / with_index:.0f}x)")
+                    print(f"    indexed plan: {explain(conn, indexed_query)}")
+                    print(f"    plain plan:   {explain(conn, plain_query)}")
+        finally:
+            with engine.begin() as conn:
+                plain.drop(conn, checkfirst=True)
+                indexed.drop(conn, checkfirst=True)
+            engine.dispose()
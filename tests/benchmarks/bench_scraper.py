@@ -0,0 +1,102 @@
+"""Records/minute for one scrape cycle against a local fake site, serial vs concurrent mode.
+
+    python -m tests.benchmarks.bench_scraper [--records 20] [--latency 0.1] [--serial-delay 1.0]
+
+Each mode starts from an empty SQLite database and scrapes --records
+bookings dated today, through listing pages, article pages, image
+downloads, cropping, LocalStorage uploads and batched inserts. Serial mode
+keeps its 2-5 s sleep after every request (scaled by --serial-delay);
+concurrent mode paces requests with the per-host token bucket, so its
+numbers depend on SCRAPER_RATE_LIMIT / --rate and SCRAPER_CONCURRENCY.
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import date
+from sqlalchemy import create_engine, func
+import scraper.database as database
+import scraper.website_scraper as website_scraper
+from scraper.crawl_state import CrawlState
+from scraper.database import Base, Mugshot, Session
+from scraper.http_cache import HttpCache
+from scraper.image_index import ImageIndex
+from scraper.scraping_target import ScrapingTarget
+from scraper.storage import LocalStorage
+from scraper.upload_pool import UploadPool
+from tests.fake_servers import FakeSiteHandler, serve
+
+logger = logging.getLogger("bench_scraper")
+
+FIRST_NAMES = ["John", "Ann", "Maria", "Kevin", "Lisa", "Carlos", "Dana", "Tyrone", "Mei", "Oscar"]
+LAST_NAMES = ["Doe", "Smith", "Lopez", "Obrien", "Nguyen", "Patel", "Brown", "Garcia", "Kim", "Reed"]
+
+
+class ScaledRandom:
+    """Stands in for the random module in website_scraper so serial mode's sleeps can be shortened."""
+
+    def __init__(self, scale):
+        self.scale = scale
+
+    def uniform(self, a, b):
+        return random.uniform(a, b) * self.scale
+
+
+def bookings(count):
+    today = date.today()
+    return [(FIRST_NAMES[n % 10], f"{LAST_NAMES[n // 10 % 10]} {n}", today) for n in range(count)]
+
+
+def run(mode, args):
+    handler = FakeSiteHandler.configure(bookings(args.records), args.per_page, args.latency)
+    with tempfile.TemporaryDirectory() as tmp, serve(handler) as server:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        Session.remove()
+        database._engine = engine
+        website_scraper.SCRAPER_MODE = mode
+        website_scraper.random = ScaledRandom(args.serial_delay) if mode == "serial" else random
+
+        target = ScrapingTarget("Texas", "Smith", f"http://127.0.0.1:{server.server_port}",
+                                rate_limit=args.rate, concurrency=args.concurrency)
+        upload_pool = UploadPool(LocalStorage(os.path.join(tmp, "images")).upload, workers=4, max_pending=16)
+        scraper = website_scraper.WebsiteScraper(
+            logger, target, http_cache=HttpCache(None), crawl_state=CrawlState(None), upload_pool=upload_pool,
+            image_index=ImageIndex(os.path.join(tmp, "images.db"))
+        )
+        started = time.perf_counter()
+        scraper.scrape_current_month()
+        elapsed = time.perf_counter() - started
+        scraper.stop()
+        upload_pool.shutdown()
+
+        session = Session()
+        stored = session.query(func.count(Mugshot.id)).scalar()
+        session.close()
+        Session.remove()
+        engine.dispose()
+    return stored, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20)
+    parser.add_argument("--per-page", type=int, default=10, help="bookings per listing page")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds the fake site takes per response")
+    parser.add_argument("--serial-delay", type=float, default=1.0,
+                        help="scale for serial mode's 2-5 s sleep after each request (1.0 is the real delay)")
+    parser.add_argument("--rate", type=float, help="requests per second per host in concurrent mode")
+    parser.add_argument("--concurrency", type=int, help="article workers in concurrent mode")
+    parser.add_argument("--modes", nargs="+", default=["serial", "concurrent"], choices=["serial", "concurrent"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    results = {}
+    for mode in args.modes:
+        stored, elapsed = run(mode, args)
+        results[mode] = stored / elapsed * 60
+        print(f"{mode:<10} {stored}/{args.records} records in {elapsed:.1f}s: {results[mode]:.1f} records/minute")
+    if len(results) == 2:
+        print(f"concurrent is {results['concurrent'] / results['serial']:.1f}x serial")
@@ -0,0 +1,51 @@
+"""Upload throughput through UploadPool against the local S3 stand-in.
+
+    python -m tests.benchmarks.bench_uploads [--images 64] [--latency 0.05]
+
+Every request to the stand-in takes --latency seconds, like a remote store.
+Workers=1 is the old one-upload-at-a-time behaviour.
+"""
+import argparse
+import io
+import os
+import time
+from scraper.storage import S3Storage
+from scraper.upload_pool import UploadPool
+from tests.fake_servers import FakeStorageHandler, serve
+
+
+def run(images, latency, workers, image_size):
+    handler = FakeStorageHandler.configure(latency=latency)
+    failures = []
+    with serve(handler) as server:
+        storage = S3Storage("mugshots", f"http://127.0.0.1:{server.server_port}", "us-east-1")
+        pool = UploadPool(storage.upload, workers=workers, max_pending=workers * 4)
+        payload = os.urandom(image_size)
+        started = time.perf_counter()
+        for n in range(images):
+            pool.submit(io.BytesIO(payload), f"bench/{n}.jpg", "image/jpeg", lambda url: None,
+                        lambda: failures.append(n))
+        pool.drain()
+        elapsed = time.perf_counter() - started
+        pool.shutdown()
+    return elapsed, len(handler.objects), len(failures)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per storage request")
+    parser.add_argument("--size", type=int, default=60_000, help="bytes per image")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    os.environ.setdefault("AWS_EC2_METADATA_DISABLED", "true")
+    baseline = None
+    for workers in args.workers:
+        elapsed, stored, failed = run(args.images, args.latency, workers, args.size)
+        rate = args.images / elapsed
+        baseline = baseline or rate
+        print(f"workers={workers:<3} {stored} stored, {failed} failed in {elapsed:.2f}s: "
+              f"{rate:.1f} uploads/s ({rate / baseline:.1f}x)")
@@ -0,0 +1,16 @@
+import pytest
+from sqlalchemy import create_engine
+import scraper.database as database
+from scraper.database import Base, Session
+
+
+@pytest.fixture
+def job_db(tmp_path, monkeypatch):
+    """A throwaway SQLite database in place of DATABASE_URL."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    Session.remove()
+    monkeypatch.setattr(database, "_engine", engine)
+    yield engine
+    Session.remove()
+    engine.dispose()
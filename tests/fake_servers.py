@@ -0,0 +1,167 @@
+"""Local HTTP stand-ins for the services the scraper talks to, for tests and benchmarks."""
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+
+@contextmanager
+def serve(handler_class):
+    """Run handler_class on a free local port in a background thread and yield the server."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+class FakeStorageHandler(BaseHTTPRequestHandler):
+    """The slice of the S3 API that S3Storage uses: PutObject and HeadObject, path-style.
+
+    Requests are not authenticated. Use configure() for a handler class with
+    its own object store, and latency to simulate a remote store.
+    """
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    objects = None
+    lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, latency=0.0):
+        return type("FakeStorage", (cls,), {"latency": latency, "objects": {}})
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _split(self):
+        parts = urlsplit(self.path)
+        bucket, _, key = parts.path.lstrip("/").partition("/")
+        return bucket, unquote(key)
+
+    def do_PUT(self):
+        bucket, key = self._split()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        with self.lock:
+            self.objects[(bucket, key)] = body
+        self._reply(200, headers={"ETag": '"fake"'})
+
+    def do_HEAD(self):
+        bucket, key = self._split()
+        time.sleep(self.latency)
+        with self.lock:
+            body = self.objects.get((bucket, key))
+        if body is None:
+            self._reply(404)
+        else:
+            self._reply(200, headers={"ETag": '"fake"', "Content-Type": "image/jpeg"})
+
+
+def mugshot_jpeg(seed, size=(300, 375)):
+    """A JPEG of seeded noise, so every booking gets an image with its own hash."""
+    import io
+    import random
+    from PIL import Image
+    image = Image.frombytes("RGB", size, random.Random(seed).randbytes(size[0] * size[1] * 3))
+    data = io.BytesIO()
+    image.save(data, format="JPEG", quality=85)
+    return data.getvalue()
+
+
+class FakeSiteHandler(BaseHTTPRequestHandler):
+    """A mugshots.zone-style site: monthly listings of h2.entry-title links, article pages and images.
+
+    Any /YYYY/MM/ listing shows the configured bookings, newest first,
+    per_page to a page; pages past the last one are 404s like the real site.
+    Every response waits latency seconds.
+    """
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    per_page = 10
+    bookings = ()
+    images = None
+
+    @classmethod
+    def configure(cls, bookings, per_page=10, latency=0.0):
+        """bookings is a list of (first name, last name, booking date)."""
+        return type("FakeSite", (cls,), {"bookings": list(bookings), "per_page": per_page, "latency": latency,
+                                         "images": {}, "lock": threading.Lock()})
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b"", content_type="text/html; charset=utf-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _title(self, index):
+        first, last, booking_date = self.bookings[index]
+        return f"{first} {last} {booking_date:%m/%d/%Y}"
+
+    def _listing(self, page):
+        start = (page - 1) * self.per_page
+        if page > 1 and start >= len(self.bookings):
+            return None
+        titles = "".join(
+            f'<article><h2 class="entry-title"><a href="http://{self.headers["Host"]}/article/{index}/">'
+            f"{self._title(index)}</a></h2><p>Booked today.</p></article>"
+            for index in range(start, min(start + self.per_page, len(self.bookings)))
+        )
+        return f"<html><body><nav>menu</nav>{titles}<footer>footer</footer></body></html>"
+
+    def _article(self, index):
+        return (
+            f"<html><body><nav>menu</nav><h1>{self._title(index)}</h1>"
+            f'<img class="attachment-full" src="http://{self.headers["Host"]}/uploads/{index}.jpg">'
+            '<div class="entry-content"><dl><dt>Age</dt><dd>34</dd><dt>Race</dt><dd>W</dd></dl>'
+            f"<h3>Charges</h3><ul><li>PUBLIC INTOXICATION Bond: ${100 + index}.00</li>"
+            "<li>FAILURE TO APPEAR</li></ul></div><footer>footer</footer></body></html>"
+        )
+
+    def _image(self, index):
+        with self.lock:
+            if index not in self.images:
+                self.images[index] = mugshot_jpeg(index)
+            return self.images[index]
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        parts = urlsplit(self.path).path.strip("/").split("/")
+        try:
+            if len(parts) == 2 and parts[0].isdigit():
+                body = self._listing(1)
+            elif len(parts) == 4 and parts[2] == "page":
+                body = self._listing(int(parts[3]))
+            elif len(parts) == 2 and parts[0] == "article" and int(parts[1]) < len(self.bookings):
+                body = self._article(int(parts[1]))
+            elif len(parts) == 2 and parts[0] == "uploads":
+                index = int(parts[1].removesuffix(".jpg"))
+                if index < len(self.bookings):
+                    return self._reply(200, self._image(index), "image/jpeg")
+                body = None
+            else:
+                body = None
+        except ValueError:
+            body = None
+        if body is None:
+            self._reply(404, b"<html><body>Not found</body></html>")
+        else:
+            self._reply(200, body.encode())
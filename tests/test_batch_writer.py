@@ -0,0 +1,46 @@
+"""MugshotBatchWriter bookkeeping when several scrapers share one writer."""
+from sqlalchemy.exc import OperationalError
+from scraper.database import DatabaseManager, MugshotBatchWriter
+
+
+def test_unsaved_is_tracked_per_owner(monkeypatch):
+    inserted = []
+    failing = True
+
+    def insert_mugshots(batch):
+        if failing:
+            raise OperationalError("INSERT", {}, Exception("database is down"))
+        inserted.extend(batch)
+        return len(batch)
+
+    monkeypatch.setattr(DatabaseManager, "insert_mugshots", staticmethod(insert_mugshots))
+    writer = MugshotBatchWriter(batch_size=100, flush_interval=3600)
+    writer.add({"firstName": "John"}, owner="smith")
+    writer.add({"firstName": "Jane"}, owner="comanche")
+
+    # Comanche's own flush fails with smith's record in the batch: neither may count as saved
+    writer.flush()
+    assert writer.unsaved("smith") == 1
+    assert writer.unsaved("comanche") == 1
+
+    failing = False
+    writer.flush()
+    assert writer.unsaved("smith") == 0
+    assert writer.unsaved("comanche") == 0
+    assert [record["firstName"] for record in inserted] == ["John", "Jane"]
+
+
+def test_unsaved_counts_records_another_thread_is_flushing(monkeypatch):
+    writer = MugshotBatchWriter(batch_size=100, flush_interval=3600)
+    seen = []
+
+    def insert_mugshots(batch):
+        # The buffer is already empty here, but nothing has been committed yet
+        seen.append(writer.unsaved("smith"))
+        return len(batch)
+
+    monkeypatch.setattr(DatabaseManager, "insert_mugshots", staticmethod(insert_mugshots))
+    writer.add({"firstName": "John"}, owner="smith")
+    writer.flush()
+    assert seen == [1]
+    assert writer.unsaved("smith") == 0
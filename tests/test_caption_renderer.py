@@ -0,0 +1,45 @@
+from datetime import date
+from types import SimpleNamespace
+from utils.caption_renderer import render_caption
+
+
+def make_record(offenses, details=""):
+    return SimpleNamespace(id=1, firstName="John", lastName="Michael Doe", dateOfBooking=date(2024, 3, 14),
+                           countyOfBooking="Smith", offenseDescription=offenses, additionalDetails=details)
+
+
+def test_render_caption_format():
+    record = make_record("- DRIVING WHILE INTOXICATED 2ND\n- POSS CS PG 1 <1G")
+    assert render_caption(record) == (
+        "DOE, JOHN M\n"
+        "Arrest Date: 03/14/2024\n"
+        "Offenses:\n"
+        "/ DRIVING WHILE INTOXICATED 2ND\n"
+        "/ POSS CS PG 1 <1G\n"
+        "\n"
+        "#SmithCounty #SmithCountyMugshots #JohnDoe"
+    )
+
+
+def test_bond_counts_repeated_charges_once_and_ignores_the_details_total():
+    record = make_record(
+        "- DWI 2ND Bond: $2,500.00\n- POSS CS PG 1 Bond: $5,000.00\n- DWI 2ND Bond: $2,500.00",
+        "Age: 34\nTotal Bond: $7,500.00",
+    )
+    caption = render_caption(record)
+    assert "Bond Amount: $7,500.00" in caption
+    assert caption.count("/ DWI 2ND") == 1
+
+
+def test_bond_lines_follow_their_charge():
+    record = make_record("- THEFT\nBond: $500\n- DWI\nBond: $500\n- THEFT\nBond: $500")
+    assert "Bond Amount: $1,000.00" in render_caption(record)
+
+
+def test_bond_falls_back_to_the_details_total():
+    record = make_record("- PUBLIC INTOXICATION", "Bond: $250.00\nTotal Bond: $1,000.00")
+    assert "Bond Amount: $1,000.00" in render_caption(record)
+
+
+def test_no_bond_line_without_amounts():
+    assert "Bond Amount" not in render_caption(make_record("- PUBLIC INTOXICATION"))
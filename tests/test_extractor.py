@@ -0,0 +1,97 @@
+"""Regression checks for ContentExtractor against saved article pages.
+
+Each tests/fixtures/articles/<name>.html has a <name>.json with the expected
+record. The expected offense_description and additional_details are what the
+original DatabaseManager.parse_content produced for the page; where the
+extractor deliberately differs, the JSON keeps the old value as
+legacy_offense_description and explains the change.
+"""
+import glob
+import json
+import os
+import time
+from decimal import Decimal
+import pytest
+from scraper.extractor import ContentExtractor, get_rules
+from scraper.html_parser import parse_article
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "articles")
+FIXTURES = sorted(os.path.splitext(os.path.basename(path))[0]
+                  for path in glob.glob(os.path.join(FIXTURES_DIR, "*.html")))
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, f"{name}.html"), "rb") as f:
+        html = f.read()
+    with open(os.path.join(FIXTURES_DIR, f"{name}.json")) as f:
+        expected = json.load(f)
+    return html, expected
+
+
+@pytest.mark.parametrize("name", FIXTURES)
+def test_extract_matches_fixture(name):
+    html, expected = load_fixture(name)
+    record = ContentExtractor().extract(parse_article(html))
+
+    assert record["firstName"] == expected["firstName"]
+    assert record["lastName"] == expected["lastName"]
+    assert record["dateOfBooking"].isoformat() == expected["dateOfBooking"]
+    assert record["image_url"] == expected["image_url"]
+    assert record["offense_description"] == expected["offense_description"]
+    assert record["additional_details"] == expected["additional_details"]
+    assert record["charges"] == expected["charges"]
+    assert record["details"] == expected["details"]
+    bond_amount = expected["bond_amount"]
+    assert record["bond_amount"] == (Decimal(bond_amount) if bond_amount is not None else None)
+
+
+@pytest.mark.parametrize("name", FIXTURES)
+def test_behaviour_changes_are_documented(name):
+    _, expected = load_fixture(name)
+    if "legacy_offense_description" in expected:
+        assert expected["legacy_offense_description"] != expected["offense_description"]
+        assert expected.get("change")
+
+
+def test_bond_amount_counts_each_charge_once():
+    html = b"""<html><body><h1>John Doe 03/14/2024</h1><div class="entry-content">
+    <dl><dt>Age</dt><dd>34</dd><dt>Total Bond</dt><dd>$7,500.00</dd></dl>
+    <h3>Charges</h3>
+    <ul><li>DWI 2ND Bond: $2,500.00</li><li>POSS CS PG 1 Bond: $5,000.00</li><li>DWI 2ND Bond: $2,500.00</li></ul>
+    </div></body></html>"""
+    record = ContentExtractor().extract(parse_article(html))
+    assert record["bond_amount"] == Decimal("7500.00")
+
+
+def test_overridden_selectors_are_kept_by_the_strainer():
+    html = b"""<html><body><h1>Jane Roe 01/05/2024</h1>
+    <div class="post"><img class="mugshot" src="https://example.com/jane.jpg">
+    <div class="post-body"><dl><dt>Age</dt><dd>41</dd><dt>Bond</dt><dd>$300.00</dd></dl>
+    <h3>Charges</h3><ul><li>CRIMINAL TRESPASS</li></ul></div></div></body></html>"""
+    rules = get_rules(overrides={"content_selector": "div.post-body", "image_selector": "img.mugshot"})
+    record = ContentExtractor(rules).extract(parse_article(html, rules.strainer))
+
+    assert record["image_url"] == "https://example.com/jane.jpg"
+    assert record["charges"] == ["CRIMINAL TRESPASS"]
+    assert record["details"] == {"Age": "41", "Bond": "$300.00"}
+    assert record["bond_amount"] == Decimal("300.00")
+
+
+def test_selectors_a_strainer_cannot_check_parse_the_whole_page():
+    rules = get_rules(overrides={"content_selector": "article > div.body"})
+    assert rules.strainer is None
+
+
+def test_extraction_throughput():
+    pages = [load_fixture(name)[0] for name in FIXTURES]
+    extractor = ContentExtractor()
+    rounds = 50
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for html in pages:
+            extractor.extract(parse_article(html))
+    elapsed = time.perf_counter() - started
+    pages_per_second = rounds * len(pages) / elapsed
+    print(f"extracted {rounds * len(pages)} pages in {elapsed:.2f}s ({pages_per_second:.0f} pages/s)")
+    # Loose floor: only catches an order-of-magnitude regression on slow CI machines
+    assert pages_per_second > 50
@@ -0,0 +1,38 @@
+import io
+from PIL import Image
+from utils.image_processor import ImageProcessor, EXIF_ORIENTATION
+
+
+def make_jpeg(width, height, orientation=None, right_band=0):
+    """Blue JPEG, optionally with the rightmost right_band columns red and an EXIF orientation tag."""
+    image = Image.new("RGB", (width, height), (0, 0, 255))
+    if right_band:
+        image.paste((255, 0, 0), (width - right_band, 0, width, height))
+    exif = Image.Exif()
+    if orientation:
+        exif[EXIF_ORIENTATION] = orientation
+    data = io.BytesIO()
+    image.save(data, format="JPEG", quality=95, exif=exif)
+    data.seek(0)
+    return data
+
+
+def test_crop_removes_the_bottom():
+    output = ImageProcessor.crop_image(make_jpeg(200, 100), crop_height=20)
+    assert Image.open(output).size == (200, 80)
+
+
+def test_crop_applies_exif_orientation():
+    # Orientation 6 is shown rotated 90 degrees clockwise: the raw right edge is the bottom of the upright photo
+    output = ImageProcessor.crop_image(make_jpeg(200, 100, orientation=6, right_band=50), crop_height=50)
+    image = Image.open(output).convert("RGB")
+    assert image.size == (100, 150)
+    red, green, blue = image.getpixel((50, 145))
+    assert blue > red
+
+
+def test_crop_scales_with_reduced_decoding():
+    output = ImageProcessor.crop_image(make_jpeg(1600, 800), crop_height=80, max_dimension=400)
+    width, height = Image.open(output).size
+    # Decoded at 1/4 scale, so the 80 px crop becomes 20 px
+    assert (width, height) == (400, 180)
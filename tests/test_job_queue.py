@@ -0,0 +1,67 @@
+"""JobQueue lease ownership on a throwaway SQLite database."""
+from datetime import date, datetime, timedelta, timezone
+from scraper.database import Mugshot, Session
+from scraper.job_queue import JobQueue
+
+
+def add_pending(today):
+    session = Session()
+    mugshot = Mugshot(firstName="John", lastName="Doe", dateOfBooking=today, stateOfBooking="Texas",
+                      countyOfBooking="Smith", imagePath="https://example.com/john.jpg", fb_status="pending")
+    session.add(mugshot)
+    session.commit()
+    mugshot_id = mugshot.id
+    session.close()
+    return mugshot_id
+
+
+def expire_lease(mugshot_id):
+    session = Session()
+    session.query(Mugshot).filter(Mugshot.id == mugshot_id).update(
+        {"lease_expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}, synchronize_session=False
+    )
+    session.commit()
+    session.close()
+
+
+def status_of(mugshot_id):
+    session = Session()
+    try:
+        return session.query(Mugshot.fb_status).filter(Mugshot.id == mugshot_id).scalar()
+    finally:
+        session.close()
+
+
+def test_stale_worker_cannot_move_a_reclaimed_record(job_db):
+    today = date.today()
+    mugshot_id = add_pending(today)
+    worker_a = JobQueue("a", lease_seconds=300)
+    worker_b = JobQueue("b", lease_seconds=300)
+
+    stale = worker_a.claim(today)
+    expire_lease(mugshot_id)
+    owned = worker_b.claim(today)
+    assert owned.attempts == stale.attempts + 1
+    assert worker_b.mark_posting(owned.id, owned.attempts)
+
+    # None of worker A's late calls may touch the row worker B is posting
+    assert not worker_a.fail(stale.id, "late failure", stale.attempts)
+    assert not worker_a.release(stale.id, stale.attempts)
+    assert not worker_a.save_caption(stale.id, stale.attempts, "late caption")
+    assert not worker_a.mark_posting(stale.id, stale.attempts)
+    assert not worker_a.complete(stale.id, stale.attempts)
+    assert status_of(mugshot_id) == "posting"
+
+    assert worker_b.complete(owned.id, owned.attempts)
+    assert status_of(mugshot_id) == "posted"
+
+
+def test_release_hands_back_the_attempt(job_db):
+    today = date.today()
+    mugshot_id = add_pending(today)
+    worker = JobQueue("a", lease_seconds=300)
+
+    record = worker.claim(today)
+    assert worker.release(record.id, record.attempts)
+    assert status_of(mugshot_id) == "pending"
+    assert worker.claim(today).attempts == record.attempts
@@ -0,0 +1,160 @@
+"""Batch API caption generation against a fake OpenAI client."""
+import json
+import logging
+from datetime import date
+from types import SimpleNamespace
+import utils.openai_generator as openai_generator
+from scraper.database import Mugshot, Session
+from scraper.job_queue import JobQueue
+from utils.openai_generator import OpenAIGenerator
+from utils.posting_pipeline import generate_backlog_captions
+
+logger = logging.getLogger(__name__)
+
+
+class FakeClock:
+    """Stands in for the time module in utils.openai_generator so polling doesn't really wait."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeOpenAI:
+    """The files and batches calls generate_batch makes.
+
+    statuses are what successive retrieve() calls report; captions maps
+    custom_id to the caption the batch returns, and ids in failed come back
+    with an error instead.
+    """
+
+    def __init__(self, statuses=("completed",), captions=None, failed=()):
+        self.statuses = list(statuses)
+        self.captions = captions or {}
+        self.failed = set(failed)
+        self.requests = []
+        self.cancelled = []
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve, cancel=self.cancelled.append)
+
+    def _create_file(self, file, purpose):
+        assert purpose == "batch"
+        name, data = file
+        self.requests = [json.loads(line) for line in data.read().decode().splitlines()]
+        return SimpleNamespace(id="file-in")
+
+    def _retrieve(self, batch_id):
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return SimpleNamespace(id="batch-1", status=status,
+                               output_file_id="file-out" if status == "completed" else None)
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        assert input_file_id == "file-in"
+        return SimpleNamespace(id="batch-1", status="validating", output_file_id=None)
+
+    def _file_content(self, file_id):
+        assert file_id == "file-out"
+        lines = []
+        for request in self.requests:
+            custom_id = request["custom_id"]
+            if custom_id in self.failed:
+                lines.append({"custom_id": custom_id, "response": {"status_code": 429, "body": {}},
+                              "error": {"message": "rate limited"}})
+            elif custom_id in self.captions:
+                body = {"choices": [{"message": {"content": f"  {self.captions[custom_id]}\n"}}],
+                        "usage": {"prompt_tokens": 100, "completion_tokens": 20}}
+                lines.append({"custom_id": custom_id, "response": {"status_code": 200, "body": body}})
+        return SimpleNamespace(text="\n".join(json.dumps(line) for line in lines))
+
+
+def make_generator(monkeypatch, client):
+    monkeypatch.setattr(openai_generator, "time", FakeClock())
+    generator = OpenAIGenerator(api_key="test")
+    generator._client = client
+    return generator
+
+
+def test_generate_batch_returns_captions_by_id(monkeypatch):
+    client = FakeOpenAI(statuses=["in_progress", "finalizing", "completed"],
+                        captions={"1": "DOE, JOHN", "3": "ROE, JANE"}, failed={"2"})
+    generator = make_generator(monkeypatch, client)
+
+    captions = generator.generate_batch({1: "prompt one", 2: "prompt two", 3: "prompt three"}, poll_interval=30)
+
+    assert captions == {"1": "DOE, JOHN", "3": "ROE, JANE"}
+    assert [request["custom_id"] for request in client.requests] == ["1", "2", "3"]
+    assert client.requests[1]["body"]["messages"] == [{"role": "user", "content": "prompt two"}]
+    assert client.cancelled == []
+
+
+def test_generate_batch_cancels_when_max_wait_runs_out(monkeypatch):
+    client = FakeOpenAI(statuses=["in_progress"])
+    generator = make_generator(monkeypatch, client)
+
+    assert generator.generate_batch({1: "prompt"}, poll_interval=30, max_wait=100) == {}
+    assert client.cancelled == ["batch-1"]
+
+
+def add_pending(today, count):
+    session = Session()
+    mugshots = [Mugshot(firstName=f"Person{n}", lastName="Doe", dateOfBooking=today, stateOfBooking="Texas",
+                        countyOfBooking="Smith", imagePath=f"https://example.com/{n}.jpg", fb_status="pending")
+                for n in range(count)]
+    session.add_all(mugshots)
+    session.commit()
+    ids = [mugshot.id for mugshot in mugshots]
+    session.close()
+    return ids
+
+
+def rows(ids):
+    session = Session()
+    try:
+        return {mugshot.id: (mugshot.fb_status, mugshot.caption, mugshot.attempts)
+                for mugshot in session.query(Mugshot).filter(Mugshot.id.in_(ids))}
+    finally:
+        session.close()
+
+
+def test_backlog_captions_are_saved_and_every_record_released(job_db, monkeypatch):
+    today = date.today()
+    ids = add_pending(today, 4)
+    # The second record is missing from the output and the third failed in the batch
+    client = FakeOpenAI(captions={str(ids[0]): "DOE, PERSON0", str(ids[3]): "DOE, PERSON3"}, failed={str(ids[2])})
+    generator = make_generator(monkeypatch, client)
+
+    assert generate_backlog_captions(JobQueue("w"), generator, logger, threshold=2, poll_interval=1) == 2
+    assert rows(ids) == {
+        ids[0]: ("pending", "DOE, PERSON0", 0),
+        ids[1]: ("pending", None, 0),
+        ids[2]: ("pending", None, 0),
+        ids[3]: ("pending", "DOE, PERSON3", 0),
+    }
+
+
+def test_backlog_batch_timeout_cancels_and_releases_everything(job_db, monkeypatch):
+    today = date.today()
+    ids = add_pending(today, 3)
+    client = FakeOpenAI(statuses=["in_progress"])
+    generator = make_generator(monkeypatch, client)
+
+    saved = generate_backlog_captions(JobQueue("w"), generator, logger, threshold=2,
+                                      lease_seconds=600, poll_interval=60)
+    assert saved == 0
+    assert client.cancelled == ["batch-1"]
+    assert rows(ids) == {mugshot_id: ("pending", None, 0) for mugshot_id in ids}
+
+
+def test_small_backlog_is_left_to_the_posting_loop(job_db, monkeypatch):
+    ids = add_pending(date.today(), 2)
+    client = FakeOpenAI()
+    generator = make_generator(monkeypatch, client)
+
+    assert generate_backlog_captions(JobQueue("w"), generator, logger, threshold=3) == 0
+    assert client.requests == []
+    assert rows(ids) == {mugshot_id: ("pending", None, 0) for mugshot_id in ids}
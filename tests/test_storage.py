@@ -0,0 +1,93 @@
+"""Storage backends that run offline: LocalStorage, S3Storage against the local stand-in, and get_storage()."""
+import io
+import pytest
+import config
+from scraper.storage import LocalStorage, S3Storage, StorageBackend, SupabaseStorage, get_storage
+from tests.fake_servers import FakeStorageHandler, serve
+
+
+def test_local_storage_writes_and_links_files(tmp_path):
+    storage = LocalStorage(str(tmp_path / "images"), public_base_url="https://cdn.example.com/mugshots/")
+    assert not storage.exists("john.jpg")
+
+    url = storage.upload(io.BytesIO(b"jpeg bytes"), "john.jpg")
+
+    assert url == "https://cdn.example.com/mugshots/john.jpg"
+    assert storage.exists("john.jpg")
+    assert (tmp_path / "images" / "john.jpg").read_bytes() == b"jpeg bytes"
+    # Nothing is left behind from the temp-file-and-rename write
+    assert [path.name for path in (tmp_path / "images").iterdir()] == ["john.jpg"]
+
+
+def test_local_storage_uploads_from_the_start_of_the_buffer(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    image_data = io.BytesIO(b"jpeg bytes")
+    image_data.read()
+
+    url = storage.upload(image_data, "john.jpg")
+
+    assert url == f"file://{tmp_path / 'john.jpg'}"
+    assert (tmp_path / "john.jpg").read_bytes() == b"jpeg bytes"
+
+
+def test_local_storage_reports_failure_as_empty_url(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    assert storage.upload(io.BytesIO(b"jpeg bytes"), "missing-dir/john.jpg") == ""
+
+
+def test_s3_storage_against_local_stand_in(monkeypatch):
+    pytest.importorskip("boto3")
+    for name, value in {"AWS_ACCESS_KEY_ID": "test", "AWS_SECRET_ACCESS_KEY": "test",
+                        "AWS_EC2_METADATA_DISABLED": "true"}.items():
+        monkeypatch.setenv(name, value)
+
+    handler = FakeStorageHandler.configure()
+    with serve(handler) as server:
+        endpoint = f"http://127.0.0.1:{server.server_port}"
+        storage = S3Storage("mugshots", endpoint, "us-east-1")
+        assert not storage.exists("john.jpg")
+        assert storage.upload(io.BytesIO(b"jpeg bytes"), "john.jpg", "image/webp") == f"{endpoint}/mugshots/john.jpg"
+        assert storage.exists("john.jpg")
+
+    assert handler.objects[("mugshots", "john.jpg")] == b"jpeg bytes"
+
+
+def test_s3_public_url_prefers_the_configured_base():
+    assert S3Storage("mugshots", public_base_url="https://cdn.example.com/").public_url("a.jpg") == \
+        "https://cdn.example.com/a.jpg"
+    assert S3Storage("mugshots").public_url("a.jpg") == "https://mugshots.s3.amazonaws.com/a.jpg"
+
+
+@pytest.mark.parametrize("backend, expected", [
+    ("supabase", SupabaseStorage),
+    ("s3", S3Storage),
+    ("local", LocalStorage),
+])
+def test_get_storage_selects_the_configured_backend(backend, expected, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "STORAGE_BACKEND", backend)
+    monkeypatch.setattr(config, "S3_BUCKET", "mugshots")
+    monkeypatch.setattr(config, "LOCAL_STORAGE_DIR", str(tmp_path / "images"))
+    monkeypatch.setattr(config, "LOCAL_STORAGE_BASE_URL", "https://cdn.example.com")
+
+    storage = get_storage()
+
+    assert type(storage) is expected
+    if backend == "s3":
+        assert storage.bucket == "mugshots"
+    if backend == "local":
+        assert storage.public_url("a.jpg") == "https://cdn.example.com/a.jpg"
+
+
+def test_get_storage_rejects_unknown_backends(monkeypatch):
+    monkeypatch.setattr(config, "STORAGE_BACKEND", "ftp")
+    with pytest.raises(ValueError):
+        get_storage()
+
+
+def test_backends_must_implement_the_whole_interface():
+    class UploadOnly(StorageBackend):
+        def upload(self, image_data, filename, content_type="image/jpeg"):
+            return ""
+
+    with pytest.raises(TypeError):
+        UploadOnly()
@@ -0,0 +1,159 @@
+"""UploadPool retries, backpressure and callbacks, with fake upload functions, LocalStorage and a local S3 stand-in."""
+import io
+import threading
+import pytest
+import scraper.upload_pool as upload_pool
+from scraper.storage import LocalStorage
+from scraper.upload_pool import UploadPool
+from tests.fake_servers import FakeStorageHandler, serve
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff delays instead of sleeping through them."""
+    delays = []
+    monkeypatch.setattr(upload_pool.time, "sleep", delays.append)
+    return delays
+
+
+class Outcome:
+    def __init__(self):
+        self.urls = []
+        self.failures = 0
+
+    def on_success(self, url):
+        self.urls.append(url)
+
+    def on_failure(self):
+        self.failures += 1
+
+
+def test_retries_with_backoff_until_upload_succeeds(sleeps):
+    results = iter([RuntimeError("connection reset"), "", "https://cdn.example.com/john.jpg"])
+    calls = []
+
+    def upload(image_data, filename, content_type):
+        calls.append(filename)
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    outcome = Outcome()
+    pool = UploadPool(upload, workers=1, max_retries=4, base_delay=1.0, max_delay=30.0)
+    pool.submit(io.BytesIO(b"jpeg"), "john.jpg", "image/jpeg", outcome.on_success, outcome.on_failure).result()
+    pool.shutdown()
+
+    assert calls == ["john.jpg"] * 3
+    assert outcome.urls == ["https://cdn.example.com/john.jpg"]
+    assert outcome.failures == 0
+    # Full jitter: each delay is drawn from [0, base_delay * 2 ** attempt]
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 1.0
+    assert 0 <= sleeps[1] <= 2.0
+
+
+def test_backoff_is_capped_and_failure_reported_after_last_attempt(sleeps):
+    calls = []
+
+    def upload(image_data, filename, content_type):
+        calls.append(filename)
+        return ""
+
+    outcome = Outcome()
+    pool = UploadPool(upload, workers=1, max_retries=6, base_delay=1.0, max_delay=3.0)
+    pool.submit(io.BytesIO(b"jpeg"), "john.jpg", "image/jpeg", outcome.on_success, outcome.on_failure).result()
+    pool.shutdown()
+
+    assert len(calls) == 6
+    assert outcome.urls == []
+    assert outcome.failures == 1
+    # No sleep after the last attempt, and none longer than max_delay
+    assert len(sleeps) == 5
+    assert all(0 <= delay <= 3.0 for delay in sleeps)
+
+
+def test_submit_blocks_while_max_pending_uploads_are_in_flight():
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def upload(image_data, filename, content_type):
+        started.release()
+        release.wait(5)
+        return f"https://cdn.example.com/{filename}"
+
+    outcome = Outcome()
+    pool = UploadPool(upload, workers=1, max_pending=2)
+    pool.submit(io.BytesIO(b"1"), "1.jpg", "image/jpeg", outcome.on_success, outcome.on_failure)
+    pool.submit(io.BytesIO(b"2"), "2.jpg", "image/jpeg", outcome.on_success, outcome.on_failure)
+    assert started.acquire(timeout=5)
+
+    third_submitted = threading.Event()
+
+    def submit_third():
+        pool.submit(io.BytesIO(b"3"), "3.jpg", "image/jpeg", outcome.on_success, outcome.on_failure)
+        third_submitted.set()
+
+    submitter = threading.Thread(target=submit_third)
+    submitter.start()
+    # One upload running and one queued fill both slots, so the third submit has to wait
+    assert not third_submitted.wait(0.2)
+
+    release.set()
+    assert third_submitted.wait(5)
+    submitter.join(5)
+    pool.drain()
+    pool.shutdown()
+    assert sorted(outcome.urls) == [f"https://cdn.example.com/{n}.jpg" for n in (1, 2, 3)]
+
+
+def test_callback_errors_do_not_leak_slots():
+    def on_success(url):
+        raise ValueError("database is down")
+
+    pool = UploadPool(lambda image_data, filename, content_type: "https://cdn.example.com/x.jpg",
+                      workers=1, max_pending=1)
+    for _ in range(3):
+        # With max_pending=1 a leaked slot would make the second submit block forever
+        pool.submit(io.BytesIO(b"x"), "x.jpg", "image/jpeg", on_success, lambda: None).result(timeout=5)
+    pool.shutdown()
+
+
+def test_uploads_into_local_storage(tmp_path):
+    storage = LocalStorage(str(tmp_path / "images"), public_base_url="https://cdn.example.com/mugshots/")
+    outcome = Outcome()
+    pool = UploadPool(storage.upload, workers=2, max_pending=4)
+    for n in range(5):
+        pool.submit(io.BytesIO(f"image {n}".encode()), f"{n}.jpg", "image/jpeg",
+                    outcome.on_success, outcome.on_failure)
+    pool.drain()
+    pool.shutdown()
+
+    assert outcome.failures == 0
+    assert sorted(outcome.urls) == [f"https://cdn.example.com/mugshots/{n}.jpg" for n in range(5)]
+    assert (tmp_path / "images" / "3.jpg").read_bytes() == b"image 3"
+    assert storage.exists("3.jpg")
+
+
+def test_uploads_to_s3_compatible_storage(monkeypatch):
+    pytest.importorskip("boto3")
+    from scraper.storage import S3Storage
+    for name, value in {"AWS_ACCESS_KEY_ID": "test", "AWS_SECRET_ACCESS_KEY": "test",
+                        "AWS_EC2_METADATA_DISABLED": "true"}.items():
+        monkeypatch.setenv(name, value)
+
+    handler = FakeStorageHandler.configure()
+    with serve(handler) as server:
+        endpoint = f"http://127.0.0.1:{server.server_port}"
+        storage = S3Storage("mugshots", endpoint, "us-east-1")
+        outcome = Outcome()
+        pool = UploadPool(storage.upload, workers=4, max_pending=8)
+        for n in range(10):
+            pool.submit(io.BytesIO(f"image {n}".encode()), f"2024/03/{n}.jpg", "image/jpeg",
+                        outcome.on_success, outcome.on_failure)
+        pool.drain()
+        pool.shutdown()
+
+    assert outcome.failures == 0
+    assert sorted(outcome.urls) == sorted(f"{endpoint}/mugshots/2024/03/{n}.jpg" for n in range(10))
+    assert handler.objects[("mugshots", "2024/03/7.jpg")] == b"image 7"
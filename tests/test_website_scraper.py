@@ -0,0 +1,52 @@
+"""One scrape cycle end to end against the local fake site, in both fetch modes."""
+import logging
+from datetime import date
+import pytest
+import scraper.website_scraper as website_scraper
+from scraper.crawl_state import CrawlState
+from scraper.database import Mugshot, Session
+from scraper.http_cache import HttpCache
+from scraper.image_index import ImageIndex
+from scraper.scraping_target import ScrapingTarget
+from scraper.storage import LocalStorage
+from scraper.upload_pool import UploadPool
+from tests.fake_servers import FakeSiteHandler, serve
+
+logger = logging.getLogger(__name__)
+
+
+class NoDelay:
+    """Stands in for the random module in website_scraper so serial mode doesn't sleep between requests."""
+
+    @staticmethod
+    def uniform(a, b):
+        return 0
+
+
+@pytest.mark.parametrize("mode", ["serial", "concurrent"])
+def test_scrape_cycle_stores_every_booking(mode, job_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(website_scraper, "SCRAPER_MODE", mode)
+    monkeypatch.setattr(website_scraper, "random", NoDelay)
+    today = date.today()
+    handler = FakeSiteHandler.configure([("John", f"Doe {n}", today) for n in range(5)], per_page=2)
+
+    with serve(handler) as server:
+        target = ScrapingTarget("Texas", "Smith", f"http://127.0.0.1:{server.server_port}/",
+                                rate_limit=100, concurrency=4)
+        upload_pool = UploadPool(LocalStorage(str(tmp_path / "images")).upload, workers=2)
+        scraper = website_scraper.WebsiteScraper(
+            logger, target, http_cache=HttpCache(None), crawl_state=CrawlState(None), upload_pool=upload_pool,
+            image_index=ImageIndex(str(tmp_path / "images.db"))
+        )
+        assert scraper.scrape_current_month() == 5
+        scraper.stop()
+        upload_pool.shutdown()
+
+    session = Session()
+    mugshots = session.query(Mugshot).order_by(Mugshot.lastName).all()
+    session.close()
+    assert [mugshot.lastName for mugshot in mugshots] == [f"Doe {n}" for n in range(5)]
+    assert all(mugshot.dateOfBooking == today and mugshot.fb_status == "pending" for mugshot in mugshots)
+    assert mugshots[3].offenseDescription == "- PUBLIC INTOXICATION Bond: $103.00\n- FAILURE TO APPEAR"
+    assert (tmp_path / "images" / f"John_Doe3_{today:%m-%d-%Y}.jpg").exists()
+    assert mugshots[3].imagePath.endswith(f"John_Doe3_{today:%m-%d-%Y}.jpg")
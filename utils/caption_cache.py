@@ -0,0 +1,81 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CaptionCache:
+    """Persistent cache of generated captions in a local SQLite file.
+
+    Entries are keyed on a hash of (model, prompt, max_tokens), expire after
+    ttl seconds and the least recently used ones are evicted beyond
+    max_entries. Each entry keeps the latency of the call that produced it so
+    hits can report the time they saved.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=5000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS captions (
+                key TEXT PRIMARY KEY,
+                caption TEXT NOT NULL,
+                latency REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model, prompt, max_tokens):
+        return hashlib.sha256(f"{model}\0{max_tokens}\0{prompt}".encode()).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT caption, latency, created_at FROM captions WHERE key = ?", (key,)).fetchone()
+            if row and now - row[2] > self.ttl:
+                self.conn.execute("DELETE FROM captions WHERE key = ?", (key,))
+                self.conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE captions SET last_used = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            self.saved_seconds += row[1]
+            return row[0]
+
+    def put(self, key, caption, latency):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO captions (key, caption, latency, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, caption, latency, now, now)
+            )
+            self.conn.execute('''
+                DELETE FROM captions WHERE key IN (
+                    SELECT key FROM captions ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 2),
+            }
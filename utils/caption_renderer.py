@@ -0,0 +1,90 @@
+import logging
+from scraper.extractor import BOND_LINE, charge_bond_texts, total_bond
+from utils.prompt import get_prompt
+
+logger = logging.getLogger(__name__)
+
+
+def _hashtag(text):
+    return "#" + "".join(c for c in text if c.isalnum())
+
+
+def _split_last_name(record):
+    # Titles are "First [Middle...] Last", so lastName holds any middle names before the surname
+    last_parts = (record.lastName or "").split()
+    return (last_parts[-1] if last_parts else ""), last_parts[:-1]
+
+
+def _format_name(record):
+    surname, middle_names = _split_last_name(record)
+    middle_initials = " ".join(part[0] for part in middle_names)
+    name = f"{surname}, {record.firstName}"
+    if middle_initials:
+        name += f" {middle_initials}"
+    return name.upper()
+
+
+def _offenses(record):
+    offenses = []
+    for line in (record.offenseDescription or "").splitlines():
+        offense = line.strip().lstrip("-").strip()
+        if offense and not BOND_LINE.match(offense) and offense not in offenses:
+            offenses.append(offense)
+    return offenses
+
+
+def _bond_amount(record):
+    details = [line for line in (record.additionalDetails or "").splitlines() if "bond" in line.lower()]
+    return total_bond(details, charge_bond_texts((record.offenseDescription or "").splitlines()))
+
+
+def render_caption(record):
+    """Build the caption format described in utils/prompt.get_prompt directly from the record."""
+    county = record.countyOfBooking or ""
+    if not county.lower().endswith("county"):
+        county = f"{county} County"
+
+    lines = [_format_name(record), f"Arrest Date: {record.dateOfBooking:%m/%d/%Y}"]
+
+    offenses = _offenses(record)
+    if offenses:
+        lines.append("Offenses:")
+        lines.extend(f"/ {offense}" for offense in offenses)
+
+    bond = _bond_amount(record)
+    if bond is not None:
+        lines.extend(["", f"Bond Amount: ${bond:,.2f}"])
+
+    surname, _ = _split_last_name(record)
+    hashtags = [_hashtag(county), _hashtag(f"{county}Mugshots"), _hashtag(f"{record.firstName}{surname}")]
+    lines.extend(["", " ".join(hashtags)])
+    return "\n".join(lines)
+
+
+class CaptionComposer:
+    """Chooses between the OpenAI caption and the local template.
+
+    Modes: "template" renders locally only, "llm" always calls OpenAI, and
+    "fallback" calls OpenAI but renders locally when it returns nothing
+    (errors and timeouts included).
+    """
+
+    def __init__(self, ai_generator=None, mode="fallback"):
+        self.ai_generator = ai_generator
+        self.mode = mode
+
+    def _fallback(self, record, caption):
+        if not caption and self.mode == "fallback":
+            logger.warning(f"OpenAI returned no caption for record {record.id}. Using the local template.")
+            return render_caption(record)
+        return caption
+
+    def compose(self, record):
+        if self.mode == "template":
+            return render_caption(record)
+        return self._fallback(record, self.ai_generator.generate_content(get_prompt(record)))
+
+    async def acompose(self, record):
+        if self.mode == "template":
+            return render_caption(record)
+        return self._fallback(record, await self.ai_generator.agenerate_content(get_prompt(record)))
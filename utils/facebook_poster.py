@@ -1,5 +1,15 @@
-import requests
+import httpx
 import logging
+import time
+from config import FACEBOOK_TIMEOUT
+from utils.http_client import get_client
+from utils.metrics import FACEBOOK_POST_SECONDS
+from scraper.rate_limiter import parse_retry_after
+
+# Graph API error codes for application, user, page and custom rate limits
+RATE_LIMIT_ERROR_CODES = {4, 17, 32, 613, 80001}
+# Errors raised before the request left this host, so Facebook cannot have created the post
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
 
 class FacebookPoster:
     def __init__(self, access_token, page_id, logger):
@@ -7,6 +17,22 @@ class FacebookPoster:
         self.page_id = page_id
         self.graph_api_url = f'https://graph.facebook.com/{page_id}/photos'
         self.logger = logger
+        # Pooled client, so consecutive posts reuse the TLS connection to graph.facebook.com
+        self.client = get_client("facebook", timeout=FACEBOOK_TIMEOUT, max_connections=4)
+        # Set by each post so callers can slow down when Facebook pushes back
+        self.throttled = False
+        self.retry_after = None
+        # Set when the request may have reached Facebook before failing, so retrying could post twice
+        self.outcome_unknown = False
+
+    @staticmethod
+    def _is_throttled(response):
+        if response.status_code == 429:
+            return True
+        try:
+            return response.json().get("error", {}).get("code") in RATE_LIMIT_ERROR_CODES
+        except ValueError:
+            return False
 
     def post_to_facebook(self, message, image_url):
         params = {
@@ -15,15 +41,28 @@ class FacebookPoster:
             'url': image_url,
         }
 
+        response = None
+        self.throttled = False
+        self.retry_after = None
+        self.outcome_unknown = False
+        started_at = time.perf_counter()
         try:
-            response = requests.post(self.graph_api_url, params=params)
+            response = self.client.post(self.graph_api_url, params=params)
+            FACEBOOK_POST_SECONDS.observe(time.perf_counter() - started_at, status=str(response.status_code))
             response.raise_for_status()
             self.logger.info("Post successful!")
-            self.logger.info(response.json())
+            # Logged as text: a body that isn't JSON must not turn a live post into a retried one
+            self.logger.info(response.text)
             return True
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
+            if response is None:
+                FACEBOOK_POST_SECONDS.observe(time.perf_counter() - started_at, status="error")
+                # A timeout or dropped connection after sending may still have created the post
+                self.outcome_unknown = not isinstance(e, NOT_SENT_ERRORS)
             self.logger.error(f"Error posting to Facebook: {e}")
-            if response:
+            if response is not None:
+                self.throttled = self._is_throttled(response)
+                self.retry_after = parse_retry_after(response.headers.get("Retry-After"))
                 self.logger.error(f"Response status code: {response.status_code}")
                 self.logger.error(f"Response content: {response.text}")
             return False
\ No newline at end of file
@@ -0,0 +1,74 @@
+import logging
+import threading
+import httpx
+from config import (HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE,
+                    HTTP_KEEPALIVE_EXPIRY, HTTP2_ENABLED)
+from utils.metrics import HTTP_CONNECTIONS, HTTP_CLIENT_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    # Only advertise encodings httpx can decode
+    ACCEPT_ENCODING = "gzip, deflate"
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _trace_hook(name):
+    def trace(event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            HTTP_CONNECTIONS.inc(client=name)
+
+    def on_request(request):
+        request.extensions["trace"] = trace
+
+    def on_response(response):
+        HTTP_CLIENT_REQUESTS.inc(client=name, http_version=response.http_version)
+
+    return on_request, on_response
+
+
+def get_client(name: str, timeout: float = None, max_connections: int = None) -> httpx.Client:
+    """Shared, pooled client for one destination ("pages", "images", "facebook", ...).
+
+    Clients live for the whole process, so connections (and HTTP/2 streams
+    where the server supports it) are reused across requests, targets and
+    User-Agent changes. Per-request headers carry anything that rotates.
+    Settings only apply when the client is first created.
+    """
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            on_request, on_response = _trace_hook(name)
+            http2 = HTTP2_ENABLED and HTTP2_AVAILABLE
+            client = httpx.Client(
+                http2=http2,
+                timeout=httpx.Timeout(timeout or HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=max_connections or HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                follow_redirects=True,
+                event_hooks={"request": [on_request], "response": [on_response]},
+            )
+            _clients[name] = client
+            logger.info(f"Created HTTP client '{name}' (HTTP/2 {'on' if http2 else 'off'})")
+        return client
+
+
+def close_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
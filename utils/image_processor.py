@@ -1,23 +1,85 @@
-import cv2
-import numpy as np
+from PIL import Image, ImageOps
+import hashlib
 import io
 
+# Pillow format name -> (file extension, content type)
+OUTPUT_FORMATS = {
+    "JPEG": ("jpg", "image/jpeg"),
+    "WEBP": ("webp", "image/webp"),
+    "AVIF": ("avif", "image/avif"),  # needs a Pillow build with AVIF support
+}
+
+EXIF_ORIENTATION = 0x0112
+
 class ImageProcessor:
     @staticmethod
-    def crop_image(image_data: io.BytesIO, crop_height: int = 50) -> io.BytesIO:
-        # Convert image data to numpy array
-        nparr = np.frombuffer(image_data.getvalue(), np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    def _crop(image_data: io.BytesIO, crop_height: int, max_dimension: int) -> Image.Image:
+        # Decode straight from the downloaded buffer without copying it
+        image_data.seek(0)
+        image = Image.open(image_data)
+        width, height = image.size
 
-        # Get image dimensions
-        height, width, _ = image.shape
+        # For JPEGs, let the decoder scale down by 1/2, 1/4 or 1/8 instead of decoding full size
+        if max_dimension and max(width, height) > max_dimension:
+            image.draft("RGB", (width * max_dimension // max(width, height), height * max_dimension // max(width, height)))
+
+        # Turn phone photos upright before cropping, like cv2.imdecode did; orientations 5-8 swap the axes
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+        if orientation in (5, 6, 7, 8):
+            height = width
+        if orientation != 1:
+            image = ImageOps.exif_transpose(image)
+        scale = height / image.size[1]
 
         # Crop the image
-        cropped_image = image[:height-crop_height, :]
-
-        # Convert back to bytes
-        is_success, buffer = cv2.imencode(".jpg", cropped_image)
-        if is_success:
-            return io.BytesIO(buffer)
-        else:
-            raise Exception("Failed to encode cropped image")
\ No newline at end of file
+        scaled_crop = round(crop_height / scale)
+        cropped_image = image.crop((0, 0, image.size[0], image.size[1] - scaled_crop))
+        if cropped_image.mode not in ("RGB", "L"):
+            cropped_image = cropped_image.convert("RGB")
+        return cropped_image
+
+    @staticmethod
+    def _encode(image: Image.Image, image_format: str, quality: int) -> io.BytesIO:
+        output = io.BytesIO()
+        try:
+            image.save(output, format=image_format, quality=quality)
+        except (KeyError, OSError) as e:
+            raise Exception(f"Failed to encode cropped image: {e}")
+        output.seek(0)
+        return output
+
+    @staticmethod
+    def crop_image(image_data: io.BytesIO, crop_height: int = 50, image_format: str = "JPEG", quality: int = 90,
+                   max_dimension: int = 0) -> io.BytesIO:
+        cropped_image = ImageProcessor._crop(image_data, crop_height, max_dimension)
+        return ImageProcessor._encode(cropped_image, image_format, quality)
+
+    @staticmethod
+    def process_image(image_data: io.BytesIO, crop_height: int = 50, image_format: str = "JPEG", quality: int = 90,
+                      max_dimension: int = 0):
+        """Crop and encode like crop_image, also returning the SHA-256 of the output and its perceptual hash."""
+        cropped_image = ImageProcessor._crop(image_data, crop_height, max_dimension)
+        output = ImageProcessor._encode(cropped_image, image_format, quality)
+        content_hash = hashlib.sha256(output.getbuffer()).hexdigest()
+        return output, content_hash, ImageProcessor.perceptual_hash(cropped_image)
+
+    @staticmethod
+    def perceptual_hash(image: Image.Image) -> int:
+        """64-bit difference hash: robust to re-encoding, resizing and small edits."""
+        small = image.convert("L").resize((9, 8), Image.BILINEAR)
+        pixels = list(small.getdata())
+        bits = 0
+        for row in range(8):
+            for col in range(8):
+                left = pixels[row * 9 + col]
+                right = pixels[row * 9 + col + 1]
+                bits = (bits << 1) | (left > right)
+        return bits
+
+    @staticmethod
+    def file_extension(image_format: str) -> str:
+        return OUTPUT_FORMATS[image_format][0]
+
+    @staticmethod
+    def content_type(image_format: str) -> str:
+        return OUTPUT_FORMATS[image_format][1]
\ No newline at end of file
@@ -0,0 +1,89 @@
+import logging
+import queue
+import threading
+from collections import deque
+from itertools import islice
+
+
+class LogQueueHandler(logging.Handler):
+    """Forwards formatted log lines to the web process without ever blocking the caller.
+
+    The queue is bounded; when the web process falls behind, lines are
+    dropped (they are still in the log file) rather than stalling the
+    scraper or the poster on a full pipe.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__()
+        self.log_queue = log_queue
+        self.dropped = 0
+
+    def emit(self, record):
+        try:
+            self.log_queue.put_nowait(self.format(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+
+class LogBroadcaster:
+    """Ring buffer of recent log lines that any number of viewers read from.
+
+    Every line gets a sequence number. Each viewer keeps its own cursor, so
+    viewers no longer take lines away from each other, and a viewer that
+    connects (or reconnects) is first sent whatever history is still in the
+    buffer.
+    """
+
+    def __init__(self, capacity=1000):
+        self.entries = deque(maxlen=capacity)
+        self.next_seq = 0
+        self.condition = threading.Condition()
+
+    def publish(self, lines):
+        with self.condition:
+            for line in lines:
+                self.entries.append((self.next_seq, line))
+                self.next_seq += 1
+            self.condition.notify_all()
+
+    def read(self, cursor, timeout):
+        """Return the (seq, line) entries at or after cursor, waiting up to timeout for new ones."""
+        with self.condition:
+            if cursor > self.next_seq:
+                # A cursor from before the web process restarted; replay what this buffer holds
+                cursor = self.next_seq - len(self.entries)
+            if cursor >= self.next_seq:
+                self.condition.wait(timeout)
+            oldest = self.next_seq - len(self.entries)
+            start = max(cursor, oldest)
+            return list(islice(self.entries, start - oldest, None))
+
+    def pump(self, log_queue, max_batch=500):
+        """Move lines from the cross-process queue into the buffer, a batch at a time."""
+        while True:
+            try:
+                lines = [log_queue.get(timeout=1)]
+            except queue.Empty:
+                continue
+            try:
+                while len(lines) < max_batch:
+                    lines.append(log_queue.get_nowait())
+            except queue.Empty:
+                pass
+            self.publish(lines)
+
+    def start_pump(self, log_queue):
+        thread = threading.Thread(target=self.pump, args=(log_queue,), daemon=True)
+        thread.start()
+        return thread
+
+
+def format_sse(entries):
+    """Render entries as one chunk of SSE events, so a burst of lines is a single write."""
+    frames = []
+    for seq, line in entries:
+        data = "\n".join(f"data: {part}" for part in line.splitlines() or [""])
+        frames.append(f"id: {seq}\n{data}\n\n")
+    return "".join(frames)
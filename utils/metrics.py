@@ -0,0 +1,229 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Metric:
+    """A named metric whose samples are keyed by their sorted label pairs."""
+
+    kind = None
+
+    def __init__(self, registry, name, documentation):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.samples = {}
+        self.lock = threading.Lock()
+        registry.register(self)
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Last value set. Across processes the largest value is reported."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.samples[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(registry, name, documentation)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            sample = self.samples.get(key)
+            if sample is None:
+                sample = self.samples[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample["buckets"][i] += 1
+            sample["sum"] += value
+            sample["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+
+class Registry:
+    """Holds this process's metrics and shares them with the web process through snapshot files.
+
+    Every process writes its samples to METRICS_DIR/<role>-<pid>.json every
+    few seconds. The web process reads all snapshots and merges them when
+    /metrics is scraped, so the numbers cover the scraper and every poster
+    without any cross-process call on the hot path.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def snapshot(self):
+        data = {}
+        for name, metric in self.metrics.items():
+            with metric.lock:
+                data[name] = [[list(map(list, key)), value] for key, value in metric.samples.items()]
+        return data
+
+    def write_snapshot(self, path):
+        directory = os.path.dirname(path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def start_exporter(self, directory, role, interval=5):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{role}-{os.getpid()}.json")
+
+        def export():
+            try:
+                self.write_snapshot(path)
+            except Exception as e:
+                logger.warning(f"Failed to write metrics snapshot {path}: {e}")
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                export()
+
+        threading.Thread(target=loop, daemon=True).start()
+        atexit.register(export)
+
+    def merge(self, directory):
+        """Combine every process's snapshot: counters and histograms are summed, gauges take the maximum."""
+        merged = {name: {} for name in self.metrics}
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, samples in data.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                for key, value in samples:
+                    key = tuple(map(tuple, key))
+                    current = merged[name].get(key)
+                    if current is None:
+                        merged[name][key] = value
+                    elif metric.kind == "counter":
+                        merged[name][key] = current + value
+                    elif metric.kind == "gauge":
+                        merged[name][key] = max(current, value)
+                    else:
+                        merged[name][key] = {
+                            "buckets": [a + b for a, b in zip(current["buckets"], value["buckets"])],
+                            "sum": current["sum"] + value["sum"],
+                            "count": current["count"] + value["count"],
+                        }
+        return merged
+
+    def render(self, directory):
+        """Prometheus text exposition format for the merged snapshots."""
+        lines = []
+        for name, samples in self.merge(directory).items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(samples.items()):
+                if metric.kind != "histogram":
+                    lines.append(f"{name}{_labels(key)} {value}")
+                    continue
+                for bound, count in zip(metric.buckets, value["buckets"]):
+                    lines.append(f"{name}_bucket{_labels(key, le=bound)} {count}")
+                lines.append(f"{name}_bucket{_labels(key, le='+Inf')} {value['count']}")
+                lines.append(f"{name}_sum{_labels(key)} {value['sum']}")
+                lines.append(f"{name}_count{_labels(key)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(key, **extra):
+    pairs = list(key) + [(name, str(value)) for name, value in extra.items()]
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def clear_snapshots(directory):
+    """Remove snapshots left by processes from a previous run."""
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+
+
+def instrument_engine(engine):
+    """Time every statement run through a SQLAlchemy engine, labelled by its leading keyword."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started_at = conn.info["query_started_at"].pop()
+        words = statement.split(None, 1)
+        DB_QUERY_SECONDS.observe(time.perf_counter() - started_at, statement=words[0].lower() if words else "")
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("query_started_at") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = Histogram(REGISTRY, "mugshoter_http_request_seconds",
+                                 "Scraper GET latency per attempt.")
+HTTP_REQUESTS = Counter(REGISTRY, "mugshoter_http_requests_total", "Scraper GET requests by outcome.")
+PARSE_SECONDS = Histogram(REGISTRY, "mugshoter_parse_seconds", "Time to parse and extract a page.")
+CROP_SECONDS = Histogram(REGISTRY, "mugshoter_crop_seconds", "Time to crop, encode and hash a mugshot.")
+UPLOAD_SECONDS = Histogram(REGISTRY, "mugshoter_upload_seconds", "Image upload latency per attempt.")
+OPENAI_SECONDS = Histogram(REGISTRY, "mugshoter_openai_seconds", "OpenAI caption request latency.")
+OPENAI_TOKENS = Counter(REGISTRY, "mugshoter_openai_tokens_total", "OpenAI tokens used.")
+FACEBOOK_POST_SECONDS = Histogram(REGISTRY, "mugshoter_facebook_post_seconds", "Facebook Graph API post latency.")
+HTTP_CONNECTIONS = Counter(REGISTRY, "mugshoter_http_connections_opened_total",
+                           "New TCP connections per shared HTTP client; compare with requests to see reuse.")
+HTTP_CLIENT_REQUESTS = Counter(REGISTRY, "mugshoter_http_client_requests_total",
+                               "Responses per shared HTTP client and HTTP version.")
+DB_QUERY_SECONDS = Histogram(REGISTRY, "mugshoter_db_query_seconds", "Database statement latency.")
+RECORDS = Counter(REGISTRY, "mugshoter_records_total", "Bookings by pipeline stage: scraped, deduped, stored, posted.")
+QUEUE_DEPTH = Gauge(REGISTRY, "mugshoter_queue_depth", "Items waiting in each internal queue.")
@@ -1,26 +1,158 @@
-from openai import OpenAI
-
+import io
+import json
 import logging
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional
+from utils.caption_cache import CaptionCache
+from utils.metrics import OPENAI_SECONDS, OPENAI_TOKENS
 
 logger = logging.getLogger(__name__)
 
 class OpenAIGenerator:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache: Optional[CaptionCache] = None, timeout: float = 60,
+                 base_url: Optional[str] = None):
         self.api_key = api_key
-        self.client = OpenAI(api_key=self.api_key)
+        self.timeout = timeout
+        self.base_url = base_url
+        self.cache = cache
+        self._client = None
+        self._async_client = None
+
+    # The openai package is slow to import, so clients are built on first use
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self.api_key, timeout=self.timeout, base_url=self.base_url)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+            self._async_client = AsyncOpenAI(api_key=self.api_key, timeout=self.timeout, base_url=self.base_url)
+        return self._async_client
+
+    def _cached(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        caption = self.cache.get(key)
+        if caption is not None:
+            logger.info(f"Caption cache hit: {self.cache.stats()}")
+        return caption
+
+    def _store(self, key: Optional[str], caption: str, started_at: float):
+        if key is not None and caption:
+            self.cache.put(key, caption, time.monotonic() - started_at)
 
+    @staticmethod
+    def _record_usage(usage, model):
+        if usage is None:
+            return
+        OPENAI_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, kind="prompt")
+        OPENAI_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, kind="completion")
 
     def generate_content(self, prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 200) -> str:
+        key = CaptionCache.make_key(model, prompt, max_tokens) if self.cache else None
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        started_at = time.monotonic()
         try:
             response = self.client.chat.completions.create(model=model,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=max_tokens)
-            return response.choices[0].message.content.strip()
+            OPENAI_SECONDS.observe(time.monotonic() - started_at, model=model, api="sync")
+            self._record_usage(response.usage, model)
+            caption = response.choices[0].message.content.strip()
+            self._store(key, caption, started_at)
+            return caption
         except Exception as e:
             logger.error(f"Error generating content with OpenAI: {e}")
             return ""
 
+    async def agenerate_content(self, prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 200) -> str:
+        key = CaptionCache.make_key(model, prompt, max_tokens) if self.cache else None
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        started_at = time.monotonic()
+        try:
+            response = await self.async_client.chat.completions.create(model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens)
+            OPENAI_SECONDS.observe(time.monotonic() - started_at, model=model, api="async")
+            self._record_usage(response.usage, model)
+            caption = response.choices[0].message.content.strip()
+            self._store(key, caption, started_at)
+            return caption
+        except Exception as e:
+            logger.error(f"Error generating content with OpenAI: {e}")
+            return ""
+
+    def generate_batch(self, prompts: Dict[Any, str], model: str = "gpt-4o-mini", max_tokens: int = 200,
+                       poll_interval: float = 30, max_wait: float = 3600) -> Dict[str, str]:
+        """Generate many captions with one Batch API job. Returns {str(id): caption} for the ones that succeeded."""
+        if not prompts:
+            return {}
+        lines = [
+            json.dumps({
+                "custom_id": str(request_id),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": model,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "max_tokens": max_tokens,
+                },
+            })
+            for request_id, prompt in prompts.items()
+        ]
+        try:
+            input_file = self.client.files.create(
+                file=("captions.jsonl", io.BytesIO("\n".join(lines).encode())),
+                purpose="batch"
+            )
+            batch = self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            logger.info(f"Submitted caption batch {batch.id} with {len(lines)} requests")
+
+            deadline = time.monotonic() + max_wait
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                if time.monotonic() > deadline:
+                    logger.warning(f"Caption batch {batch.id} still {batch.status} after {max_wait}s. Cancelling.")
+                    self.client.batches.cancel(batch.id)
+                    return {}
+                time.sleep(poll_interval)
+                batch = self.client.batches.retrieve(batch.id)
+
+            if batch.status != "completed" or not batch.output_file_id:
+                logger.error(f"Caption batch {batch.id} ended with status {batch.status}")
+                return {}
+
+            captions = {}
+            for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                response = result.get("response") or {}
+                if response.get("status_code") != 200:
+                    logger.warning(f"Caption request {result.get('custom_id')} failed in batch: {result.get('error')}")
+                    continue
+                usage = response["body"].get("usage") or {}
+                OPENAI_TOKENS.inc(usage.get("prompt_tokens", 0), model=model, kind="prompt")
+                OPENAI_TOKENS.inc(usage.get("completion_tokens", 0), model=model, kind="completion")
+                content = response["body"]["choices"][0]["message"]["content"]
+                captions[result["custom_id"]] = content.strip()
+            logger.info(f"Caption batch {batch.id} returned {len(captions)} of {len(lines)} captions")
+            return captions
+        except Exception as e:
+            logger.error(f"Error generating caption batch with OpenAI: {e}")
+            return {}
+
     def generate_from_template(self, template: str, data: Dict[str, Any]) -> str:
         try:
             prompt = template.format(**data)
@@ -30,4 +162,4 @@ class OpenAIGenerator:
             return ""
         except Exception as e:
             logger.error(f"Error generating content from template: {e}")
-            return ""
+            return ""
\ No newline at end of file
@@ -0,0 +1,213 @@
+import asyncio
+import queue
+import threading
+import time
+from datetime import date
+from utils.prompt import get_prompt
+from utils.metrics import QUEUE_DEPTH
+from scraper.rate_limiter import AdaptiveInterval
+
+
+class PostingPipeline:
+    """Generates captions ahead of time and posts them at a fixed rate.
+
+    A background thread runs an asyncio loop with several generation workers
+    that claim records and write captions into a bounded ready buffer. The
+    posting loop drains the buffer, starting a post every post_interval
+    seconds, so generation latency no longer adds to the gap between posts.
+    The gap widens when Facebook reports rate limiting and shrinks back to
+    post_interval as posts succeed again.
+    Workers only claim a record when there is room for it: at most
+    buffer_size records, and never more than can be posted at the current
+    interval before their lease runs out. The lease of each record is renewed
+    when it is taken off the buffer, so a widened interval does not let it
+    expire and be claimed again by another worker.
+    """
+
+    def __init__(self, job_queue, composer, fb_poster, logger, generation_workers=3, buffer_size=5,
+                 post_interval=18, max_post_interval=600):
+        self.job_queue = job_queue
+        self.composer = composer
+        self.fb_poster = fb_poster
+        self.logger = logger
+        self.generation_workers = generation_workers
+        self.post_pacer = AdaptiveInterval(post_interval, max_post_interval)
+        self.buffer_size = buffer_size
+        self.lease_seconds = job_queue.lease.total_seconds()
+        self.ready = queue.Queue(maxsize=buffer_size)
+        # Records claimed by this pipeline and not yet posted or handed back
+        self.claimed = 0
+        self.claimed_lock = threading.Lock()
+
+    def _capacity(self):
+        return max(1, min(self.buffer_size, int(self.lease_seconds // self.post_pacer.interval)))
+
+    async def _reserve(self, exit_event):
+        while not exit_event.is_set():
+            with self.claimed_lock:
+                if self.claimed < self._capacity():
+                    self.claimed += 1
+                    return True
+            await asyncio.sleep(0.5)
+        return False
+
+    def _unreserve(self):
+        with self.claimed_lock:
+            self.claimed -= 1
+
+    async def _put_ready(self, item, exit_event):
+        while not exit_event.is_set():
+            try:
+                self.ready.put_nowait(item)
+                QUEUE_DEPTH.set(self.ready.qsize(), queue="ready_captions")
+                return True
+            except queue.Full:
+                await asyncio.sleep(0.5)
+        return False
+
+    async def _generation_worker(self, exit_event, wait_lock):
+        while not exit_event.is_set():
+            # Claim only once the buffer has room, so no record waits there past its lease
+            if not await self._reserve(exit_event):
+                break
+            handed_over = False
+            try:
+                record = await asyncio.to_thread(self.job_queue.claim, date.today())
+                if record is None:
+                    # One worker listens for new rows at a time; the rest queue up behind it
+                    async with wait_lock:
+                        await asyncio.to_thread(self.job_queue.wait_for_jobs, 5)
+                    continue
+
+                caption = record.caption
+                if not caption:
+                    caption = await self.composer.acompose(record)
+                    if not caption:
+                        await asyncio.to_thread(self.job_queue.fail, record.id, "Empty caption", record.attempts)
+                        continue
+                    await asyncio.to_thread(self.job_queue.save_caption, record.id, record.attempts, caption)
+                    self.logger.info(f"Generated caption for record {record.id}")
+                handed_over = await self._put_ready((record, caption), exit_event)
+                if not handed_over:
+                    await asyncio.to_thread(self.job_queue.release, record.id, record.attempts)
+            except Exception as e:
+                self.logger.error(f"Error in caption generation worker: {str(e)}")
+                self.logger.exception("Exception details:")
+                await asyncio.sleep(5)
+            finally:
+                if not handed_over:
+                    self._unreserve()
+
+    async def _generate(self, exit_event):
+        wait_lock = asyncio.Lock()
+        await asyncio.gather(*(self._generation_worker(exit_event, wait_lock) for _ in range(self.generation_workers)))
+
+    def _post(self, record, caption):
+        if not self.job_queue.mark_posting(record.id, record.attempts):
+            self.logger.warning(f"Lost the lease on record {record.id} before posting. Skipping.")
+            return False
+        posted = self.fb_poster.post_to_facebook(caption, record.imagePath)
+        if self.fb_poster.throttled:
+            self.post_pacer.on_throttle(self.fb_poster.retry_after)
+            self.logger.warning(f"Facebook is rate limiting posts. Posting every {self.post_pacer.interval:.0f}s")
+        elif posted:
+            self.post_pacer.on_success()
+        if posted:
+            self.job_queue.complete(record.id, record.attempts)
+            self.logger.info(f"Record {record.id} processed and posted successfully.")
+        else:
+            self.logger.error(f"Failed to post record {record.id} to Facebook. Not marking as processed.")
+            if self.fb_poster.outcome_unknown:
+                self.job_queue.fail(record.id, "Facebook post timed out; it may already be live", record.attempts,
+                                    retry=False)
+            else:
+                self.job_queue.fail(record.id, "Facebook post failed", record.attempts)
+        return True
+
+    def run(self, exit_event):
+        generator_thread = threading.Thread(target=asyncio.run, args=(self._generate(exit_event),), daemon=True)
+        generator_thread.start()
+        next_post_at = 0
+        next_recovery_at = 0
+
+        while not exit_event.is_set():
+            try:
+                if time.monotonic() >= next_recovery_at:
+                    self.job_queue.recover_expired_posts()
+                    next_recovery_at = time.monotonic() + 60
+                try:
+                    record, caption = self.ready.get(timeout=1)
+                except queue.Empty:
+                    continue
+                try:
+                    QUEUE_DEPTH.set(self.ready.qsize(), queue="ready_captions")
+
+                    delay = max(0, next_post_at - time.monotonic())
+                    if not self.job_queue.renew(record.id, record.attempts, delay):
+                        self.logger.warning(f"Lost the lease on record {record.id} while it was buffered. Skipping.")
+                        continue
+                    if delay > 0 and exit_event.wait(delay):
+                        self.job_queue.release(record.id, record.attempts)
+                        break
+
+                    started_at = time.monotonic()
+                    if self._post(record, caption):
+                        # Respect Facebook's rate limit, measured from the start of each post
+                        next_post_at = self.post_pacer.next_start(started_at)
+                finally:
+                    self._unreserve()
+            except Exception as e:
+                self.logger.error(f"Error in posting loop: {str(e)}")
+                self.logger.exception("Exception details:")
+
+        generator_thread.join(timeout=10)
+        while not self.ready.empty():
+            record, _ = self.ready.get_nowait()
+            self.job_queue.release(record.id, record.attempts)
+
+
+def generate_backlog_captions(job_queue, ai_generator, logger, threshold=20, batch_size=500, lease_seconds=3600,
+                              poll_interval=30):
+    """Caption a large pending backlog with one OpenAI Batch API job instead of one call per record.
+
+    Claimed records get their captions saved and are then handed back to
+    pending, so the normal posting loop posts them without generating again.
+    This blocks until the batch finishes; use start_backlog_captions to keep
+    posting the unclaimed records meanwhile.
+    """
+    today = date.today()
+    pending = job_queue.count_pending(today)
+    if pending < threshold:
+        return 0
+    logger.info(f"{pending} records waiting for captions. Generating them with the Batch API.")
+
+    records = job_queue.claim_many(today, batch_size, lease_seconds)
+    try:
+        captions = ai_generator.generate_batch(
+            {record.id: get_prompt(record) for record in records},
+            poll_interval=poll_interval,
+            # Leave time to save the captions before the lease runs out
+            max_wait=lease_seconds - min(300, lease_seconds // 4)
+        )
+        for record in records:
+            caption = captions.get(str(record.id))
+            if caption:
+                job_queue.save_caption(record.id, record.attempts, caption)
+        return len(captions)
+    finally:
+        for record in records:
+            job_queue.release(record.id, record.attempts)
+
+
+def start_backlog_captions(job_queue, ai_generator, logger, threshold=20, batch_size=500, lease_seconds=3600):
+    """Run generate_backlog_captions on a background thread so the posting loop starts right away."""
+    def run():
+        try:
+            generate_backlog_captions(job_queue, ai_generator, logger, threshold, batch_size, lease_seconds)
+        except Exception as e:
+            logger.error(f"Error generating backlog captions: {str(e)}")
+            logger.exception("Exception details:")
+
+    thread = threading.Thread(target=run, name="backlog-captions", daemon=True)
+    thread.start()
+    return thread
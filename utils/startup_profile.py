@@ -0,0 +1,46 @@
+import re
+import subprocess
+import sys
+import time
+
+# "import time: self [us] | cumulative | imported package", nested imports are indented by two spaces
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$")
+
+
+def profile_imports(modules):
+    """Import modules in a fresh interpreter with -X importtime.
+
+    Returns the wall-clock time of the whole interpreter run in seconds, the
+    parsed (module, self_us, cumulative_us, depth) rows, and stderr when the
+    imports failed.
+    """
+    code = "; ".join(f"import {module}" for module in modules) or "pass"
+    started_at = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    elapsed = time.perf_counter() - started_at
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    error = result.stderr.strip().splitlines()[-1] if result.returncode else None
+    return elapsed, rows, error
+
+
+def report(roles, top=10):
+    """Print per-role startup time and the slowest imports of each role."""
+    for role, modules in roles.items():
+        elapsed, rows, error = profile_imports(modules)
+        print(f"\n== {role}: {elapsed * 1000:.0f} ms to start ({', '.join(modules) or 'interpreter only'})")
+        if error:
+            print(f"   imports failed: {error}")
+        top_level = sorted((row for row in rows if row[3] == 0), key=lambda row: row[2], reverse=True)
+        print("   slowest top-level imports (cumulative ms):")
+        for module, _, cumulative_us, _ in top_level[:top]:
+            print(f"   {cumulative_us / 1000:9.1f}  {module}")
+        by_self = sorted(rows, key=lambda row: row[1], reverse=True)
+        print("   slowest modules on their own (self ms):")
+        for module, self_us, _, _ in by_self[:top]:
+            print(f"   {self_us / 1000:9.1f}  {module}")